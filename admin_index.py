@@ -0,0 +1,140 @@
+from bisect import bisect_left, insort
+import heapq
+import time
+
+# Проверка с score не ниже порога считается угрозой
+THREAT_SCORE = 40
+# Скользящее окно риска: RISK_BUCKETS корзин по RISK_BUCKET_SECONDS (по умолчанию сутки по 4 часа)
+RISK_BUCKET_SECONDS = 4 * 3600
+RISK_BUCKETS = 6
+TOP_K = 50
+
+
+def risk_bucket(ts=None) -> int:
+    """Номер временной корзины для момента ts (по умолчанию - сейчас)"""
+    return int((time.time() if ts is None else ts) // RISK_BUCKET_SECONDS)
+
+
+def new_ring(buckets=RISK_BUCKETS) -> list:
+    """Кольцо корзин пользователя: [номер корзины, проверок, угроз, сумма score] * buckets"""
+    return [0] * (4 * buckets)
+
+
+def ring_add(ring, bucket, n, threats, score_sum):
+    i = (bucket % (len(ring) // 4)) * 4
+    if ring[i] != bucket:
+        if ring[i] > bucket: return  # событие старше окна: слот уже занят более новой корзиной
+        ring[i:i + 4] = [bucket, 0, 0, 0]
+    ring[i + 1] += n
+    ring[i + 2] += threats
+    ring[i + 3] += score_sum
+
+
+def ring_totals(ring, now) -> tuple:
+    """(проверок, угроз, сумма score) за окно, заканчивающееся корзиной now"""
+    oldest = now - len(ring) // 4
+    n = threats = score_sum = 0
+    for i in range(0, len(ring), 4):
+        if oldest < ring[i] <= now:
+            n += ring[i + 1]
+            threats += ring[i + 2]
+            score_sum += ring[i + 3]
+    return n, threats, score_sum
+
+
+class ActivityIndex:
+    """Инкрементальные индексы админки: топ-K активных и рейтинг риска за скользящее окно.
+
+    Топ-K - словарь не больше top_k пользователей: счетчики проверок только растут, поэтому
+    попасть в топ можно лишь обогнав его минимум, и пересборка нужна только при удалении.
+    Рейтинг риска - отсортированный список (угрозы, средний score) пользователей с угрозами
+    в окне; он правится на каждом событии и пересобирается раз в корзину, когда старые
+    корзины выпадают из окна. Память на пользователя - одно кольцо из RISK_BUCKETS корзин.
+    """
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self._top = {}      # uid -> проверок
+        self._top_min = 0
+        self._risky = {}    # uid -> кольцо (только пользователи с угрозами в окне)
+        self._keys = {}     # uid -> ключ в _rank
+        self._rank = []     # [(-угроз, -средний score, uid)] по возрастанию = по убыванию риска
+        self._now = None    # корзина, на которую построен _rank
+
+    # === ТОП АКТИВНЫХ ===
+    def rebuild_top(self, items):
+        """Полная пересборка по (uid, проверок): при загрузке и после удаления пользователя из топа"""
+        self._top = dict(heapq.nlargest(self.top_k, items, key=lambda item: item[1]))
+        self._top_min = min(self._top.values(), default=0)
+
+    def touch(self, uid, analyzes):
+        top = self._top
+        if uid in top:
+            was_min = top[uid] == self._top_min
+            top[uid] = analyzes
+            if was_min: self._top_min = min(top.values())
+        elif len(top) < self.top_k:
+            top[uid] = analyzes
+            self._top_min = min(self._top_min, analyzes) if len(top) > 1 else analyzes
+        elif analyzes > self._top_min:
+            del top[min(top, key=top.get)]
+            top[uid] = analyzes
+            self._top_min = min(top.values())
+
+    def top(self, limit):
+        """uid самых активных, по убыванию (limit <= top_k)"""
+        return [uid for uid, _ in sorted(self._top.items(), key=lambda item: -item[1])[:limit]]
+
+    # === РЕЙТИНГ РИСКА ===
+    def ring(self, uid):
+        return self._risky.get(uid)
+
+    def track(self, uid, ring):
+        """Регистрация кольца при загрузке; пользователи без угроз в окне отсеются при первом чтении"""
+        if any(ring[i] for i in range(2, len(ring), 4)):
+            self._risky[uid] = ring
+            self._now = None
+
+    def add(self, uid, ring, bucket, n, threats, score_sum):
+        """Учет проверок в кольце пользователя и в рейтинге"""
+        ring_add(ring, bucket, n, threats, score_sum)
+        if not threats and uid not in self._risky: return
+        self._risky[uid] = ring
+        if bucket == self._now: self._rerank(uid, ring)
+        else: self._now = None  # новая (или запоздалая) корзина: рейтинг пересоберется при чтении
+
+    def forget(self, uid):
+        """Удаление пользователя; True, если он был в топе (нужен rebuild_top)"""
+        self._risky.pop(uid, None)
+        key = self._keys.pop(uid, None)
+        if key is not None: del self._rank[bisect_left(self._rank, key)]
+        return self._top.pop(uid, None) is not None
+
+    def risky(self, limit, now=None):
+        """[(uid, угроз, средний score)] по убыванию риска за окно"""
+        now = risk_bucket() if now is None else now
+        if now != self._now: self._rebuild(now)
+        return [(uid, -threats, -avg) for threats, avg, uid in self._rank[:limit]]
+
+    def _key(self, uid, ring):
+        n, threats, score_sum = ring_totals(ring, self._now)
+        return (-threats, -round(score_sum / n, 1), uid) if threats else None
+
+    def _rerank(self, uid, ring):
+        old = self._keys.pop(uid, None)
+        if old is not None: del self._rank[bisect_left(self._rank, old)]
+        key = self._key(uid, ring)
+        if key is None:
+            del self._risky[uid]
+        else:
+            self._keys[uid] = key
+            insort(self._rank, key)
+
+    def _rebuild(self, now):
+        self._now = now
+        self._keys = {}
+        for uid, ring in list(self._risky.items()):
+            key = self._key(uid, ring)
+            if key is None: del self._risky[uid]
+            else: self._keys[uid] = key
+        self._rank = sorted(self._keys.values())
@@ -1,57 +1,358 @@
-import json, os
+import heapq, json, os, threading
 from datetime import datetime
+from admin_index import THREAT_SCORE, TOP_K, ActivityIndex, new_ring, risk_bucket
+from admin_users import UserTable
 
 class AdminPanel:
     def __init__(self, db='aegis_users.json'):
         self.db = db
+        self._write_lock = threading.Lock()
+        self._saves = self._written = 0  # номер последнего подготовленного и последнего записанного снимка
         self.load()
 
     def load(self):
         if os.path.exists(self.db):
-            with open(self.db, 'r', encoding='utf-8') as f:
-                self.d = json.load(f)
-                if 'blocked_users' not in self.d: self.d['blocked_users'] = {}
+            with open(self.db, 'r', encoding='utf-8') as f: self._restore(json.load(f))
         else:
-            self.d = {'users': {}, 'stats': {'analyzes': 0, 'threats': 0}, 'blocked_users': {}}
+            self._restore({})
             self.save()
 
-    def save(self):
-        with open(self.db, 'w', encoding='utf-8') as f: json.dump(self.d, f, ensure_ascii=False, indent=2)
+    def _restore(self, d):
+        """Состояние из снимка: пользователи - компактная таблица, блокировки - по целому uid"""
+        self.d = {'stats': d.get('stats', {'analyzes': 0, 'threats': 0})}
+        self.users = UserTable.load(d.get('users', {}))
+        self.blocked = {int(uid): b for uid, b in d.get('blocked_users', {}).items()}
+        self.index = ActivityIndex()
+        self.index.rebuild_top(self.users.counts())
+        for uid, ring in self.users.risk.items(): self.index.track(uid, ring)
+        return d
+
+    def _snapshot(self):
+        return {'users': self.users.dump(), 'stats': self.d['stats'], 'blocked_users': self.blocked}
+
+    def save(self): self.prepare_save()()
+
+    def prepare_save(self):
+        """Копия состояния и функция, которая пишет ее снимком. Функцию можно вызвать вне блокировки
+        и из другого потока: сериализация идет по копии, более старый снимок поверх нового не пишется."""
+        snapshot = self._capture()
+        self._saves += 1
+        n = self._saves
+        def write():
+            with self._write_lock:
+                if n <= self._written: return
+                self._write({**snapshot, 'users': snapshot['users'].dump()})
+                self._written = n
+        return write
+
+    def _capture(self):
+        return {'users': self.users.copy(), 'stats': dict(self.d['stats']), 'blocked_users': dict(self.blocked)}
+
+    def _write(self, snapshot):
+        with open(self.db, 'w', encoding='utf-8') as f: json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _apply(self, op, *args):
+        """Применение события к состоянию в памяти (общая точка для методов и реплея журнала)"""
+        if op == 'counters':
+            rows, analyzes, threats = args
+            if isinstance(rows, dict): rows = [[uid, None, n, 0, 0] for uid, n in rows.items()]  # старый формат {uid: n}
+            for uid, bucket, n, t, score_sum in rows: self._count(int(uid), bucket, n, t, score_sum)
+            self.d['stats']['analyzes'] += analyzes
+            self.d['stats']['threats'] += threats
+            return
+        uid = int(args[0])
+        if op == 'add_user':
+            u = args[1]
+            self.users.add(uid, u.get('username'), u.get('name'), u.get('joined'), u.get('analyzes', 0))
+            self.index.touch(uid, u.get('analyzes', 0))
+        elif op == 'log_analysis':
+            # Старый журнал хранил (uid, threat) без score и корзины
+            score, bucket = args[1:] if len(args) == 3 else (THREAT_SCORE if args[1] else 0, None)
+            threat = score >= THREAT_SCORE
+            self._count(uid, bucket, 1, int(threat), score)
+            self.d['stats']['analyzes'] += 1
+            if threat: self.d['stats']['threats'] += 1
+        elif op == 'delete_user':
+            self.users.remove(uid)
+            if self.index.forget(uid): self.index.rebuild_top(self.users.counts())
+        elif op == 'block_user': self.blocked[uid] = args[1]
+        elif op == 'unblock_user': self.blocked.pop(uid, None)
+        else: raise ValueError(f"Неизвестное событие: {op}")
+
+    def _count(self, uid, bucket, n, threats, score_sum):
+        """Счетчик проверок пользователя + индексы (bucket=None - событие без корзины)"""
+        analyzes = self.users.incr(uid, n)
+        if analyzes is None: return
+        self.index.touch(uid, analyzes)
+        if bucket is not None:
+            ring = self.users.risk.get(uid)
+            if ring is None: ring = self.users.risk[uid] = new_ring()
+            self.index.add(uid, ring, bucket, n, threats, score_sum)
+
+    def _commit(self, op, *args, deferred=False):
+        """Сохранение после события; JSON-режим переписывает файл целиком.
+        deferred - не писать, а вернуть функцию записи (см. prepare_save) или None, если писать нечего."""
+        if deferred: return self.prepare_save()
+        self.save()
+
+    def _event(self, op, *args, deferred=False):
+        self._apply(op, *args)
+        return self._commit(op, *args, deferred=deferred)
 
     def add_user(self, uid, username, first_name):
-        uid = str(uid)
-        if uid in self.d['blocked_users']: return False
-        if uid not in self.d['users']:
-            self.d['users'][uid] = {'user_id': uid, 'username': username, 'name': first_name, 'joined': str(datetime.now()), 'analyzes': 0}
-            self.save()
+        if int(uid) in self.blocked: return False
+        if uid not in self.users:
+            self._event('add_user', str(uid), {'user_id': str(uid), 'username': username, 'name': first_name, 'joined': str(datetime.now()), 'analyzes': 0})
         return True
 
-    def log_analysis(self, uid, threat):
-        uid = str(uid)
-        if uid in self.d['users']: self.d['users'][uid]['analyzes'] += 1
-        self.d['stats']['analyzes'] += 1
-        if threat: self.d['stats']['threats'] += 1
-        self.save()
+    def log_analysis(self, uid, score):
+        """Учет проверки с итоговым score (угроза - score >= THREAT_SCORE)"""
+        self._event('log_analysis', str(uid), int(score), risk_bucket())
+
+    def apply_counters(self, rows, analyzes, threats, deferred=False):
+        """Пачка приращений одним событием (для WriteBehindPanel): rows - [uid, корзина, проверок, угроз, сумма score].
+        deferred - снимок не пишется, а возвращается функция записи для вызова вне блокировки (или None)."""
+        return self._event('counters', [[str(uid), bucket, n, t, s] for uid, bucket, n, t, s in rows], analyzes, threats, deferred=deferred)
 
     def delete_user(self, uid):
-        if str(uid) in self.d['users']: del self.d['users'][str(uid)]; self.save()
+        if uid in self.users: self._event('delete_user', str(uid))
 
-    def get_user(self, uid): return self.d['users'].get(str(uid))
+    def get_user(self, uid): return self.users.get(uid)
 
     def get_stats(self):
-        return {'users': len(self.d['users']), 'analyzes': self.d['stats']['analyzes'], 'threats': self.d['stats']['threats'], 'blocked_users': len(self.d['blocked_users'])}
+        return {'users': len(self.users), 'analyzes': self.d['stats']['analyzes'], 'threats': self.d['stats']['threats'], 'blocked_users': len(self.blocked)}
 
     def block_user(self, uid, reason="Ban"):
-        self.d['blocked_users'][str(uid)] = {'user_id': uid, 'reason': reason, 'date': str(datetime.now())}
-        self.save()
+        self._event('block_user', str(uid), {'user_id': uid, 'reason': reason, 'date': str(datetime.now())})
 
     def unblock_user(self, uid):
-        if str(uid) in self.d['blocked_users']: del self.d['blocked_users'][str(uid)]; self.save()
+        if int(uid) in self.blocked: self._event('unblock_user', str(uid))
+
+    def is_blocked(self, uid): return int(uid) in self.blocked
 
-    def is_blocked(self, uid): return str(uid) in self.d['blocked_users']
+    def get_blocked_users(self): return list(self.blocked.values())
 
-    def get_blocked_users(self): return list(self.d['blocked_users'].values())
+    # === СТРАНИЦЫ ДЛЯ АДМИНКИ (keyset: после uid `after`, по возрастанию uid) ===
+    def get_users_page(self, after=None, limit=10):
+        after = -1 if after is None else int(after)
+        return [self.users.get(u) for u in heapq.nsmallest(limit, (u for u in self.users.ids() if u > after))]
+
+    def get_blocked_page(self, after=None, limit=10):
+        after = -1 if after is None else int(after)
+        return [self.blocked[u] for u in heapq.nsmallest(limit, (u for u in self.blocked if u > after))]
+
+    def get_top_users(self, limit=5):
+        if limit > TOP_K: return [self.users.get(uid) for uid, _ in heapq.nlargest(limit, self.users.counts(), key=lambda item: item[1])]
+        return [self.users.get(uid) for uid in self.index.top(limit)]
+
+    def get_risky_users(self, limit=10):
+        """Самые рискованные за скользящее окно: угрозы, затем средний score"""
+        return [{**self.users.get(uid), 'threats': threats, 'avg_score': avg} for uid, threats, avg in self.index.risky(limit)]
 
     def get_admin_report(self):
         s = self.get_stats()
         return {'summary': {'total_users': s['users'], 'total_analyzes': s['analyzes'], 'threats_detected': s['threats'], 'blocked_users': s['blocked_users']}}
+
+    def close(self): pass
+
+
+class JournaledAdminPanel(AdminPanel):
+    """Снимок + журнал событий: каждое событие дописывает одну строку вместо перезаписи всей базы.
+
+    Снимок (`db`) хранит номер последнего учтенного события `seq`, журнал (`db + '.journal'`)
+    хранит события `[seq, op, args]` по одному на строку. Раз в `compact_every` событий
+    журнал сворачивается в новый снимок. После падения теряется только недописанный хвост.
+    """
+
+    def __init__(self, db='aegis_users.json', journal=None, compact_every=10000, fsync=False):
+        self.journal = journal or db + '.journal'
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.seq = 0
+        self._pending = 0
+        self._jf = None
+        self._jlock = threading.RLock()  # дозапись в журнал против его обрезки после снимка, записанного в другом потоке
+        super().__init__(db)
+
+    def load(self):
+        d = {}
+        if os.path.exists(self.db):
+            with open(self.db, 'r', encoding='utf-8') as f: d = json.load(f)
+        self.seq = self._restore(d).get('seq', 0)
+        self._pending = 0
+
+        # === РЕПЛЕЙ ЖУРНАЛА ===
+        good = 0
+        if os.path.exists(self.journal):
+            with open(self.journal, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'): break  # оборванная запись при падении
+                    try: seq, op, args = json.loads(line)
+                    except ValueError: break
+                    good += len(line)
+                    if seq <= self.seq: continue  # уже в снимке (упали между снимком и очисткой журнала)
+                    self._apply(op, *args)
+                    self.seq = seq
+                    self._pending += 1
+            with open(self.journal, 'r+b') as f: f.truncate(good)
+
+        if self._jf: self._jf.close()
+        self._jf = open(self.journal, 'a', encoding='utf-8')
+        if not os.path.exists(self.db): self.save()
+
+    def prepare_save(self):
+        """Компактация: снимок и очистка журнала (запись - как в AdminPanel.prepare_save)"""
+        self._pending = 0
+        return super().prepare_save()
+
+    def _capture(self): return {**super()._capture(), 'seq': self.seq}
+
+    def _write(self, snapshot):
+        """Атомарная запись снимка, затем из журнала убираются учтенные в нем события.
+        Пока снимок писался из другого потока, журнал мог пополниться: эти строки остаются."""
+        tmp = self.db + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, self.db)
+        with self._jlock:
+            if not self._jf: return
+            self._jf.flush()
+            with open(self.journal, 'rb') as f: lines = f.readlines()
+            keep = next((i for i, line in enumerate(lines) if int(line[1:line.index(b',')]) > snapshot['seq']), len(lines))
+            if keep == len(lines): self._jf.truncate(0)
+            elif keep:
+                tmp = self.journal + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.writelines(lines[keep:])
+                    f.flush(); os.fsync(f.fileno())
+                self._jf.close()
+                os.replace(tmp, self.journal)
+                self._jf = open(self.journal, 'a', encoding='utf-8')
+
+    def _commit(self, op, *args, deferred=False):
+        with self._jlock:
+            self.seq += 1
+            self._jf.write(json.dumps([self.seq, op, args], ensure_ascii=False, separators=(',', ':')) + '\n')
+            self._jf.flush()
+            if self.fsync: os.fsync(self._jf.fileno())
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            if deferred: return self.prepare_save()
+            self.save()
+
+    def close(self):
+        if self._jf: self._jf.close(); self._jf = None
+
+
+class WriteBehindPanel:
+    """Буфер счетчиков перед любой панелью: log_analysis только копит приращения в памяти,
+    фоновый поток сбрасывает их одной пачкой по размеру (max_pending) или времени (interval).
+
+    Остальные методы проксируются в панель под общей блокировкой, поэтому панель
+    не трогают два потока сразу. Сброс держит ее только на время применения пачки и копии
+    состояния: снимок сериализуется и пишется уже без нее, и is_blocked из event loop не ждет
+    записи файла. Чтения get_user/get_stats учитывают еще не сброшенный буфер.
+    """
+
+    def __init__(self, panel, max_pending=1000, interval=2.0):
+        self.panel = panel
+        self.max_pending = max_pending
+        self.interval = interval
+        self.lock = threading.RLock()
+        self._buf_lock = threading.Lock()
+        self._per_user, self._analyzes, self._threats = {}, 0, 0  # _per_user: uid -> {корзина: [проверок, угроз, сумма score]}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='aegis-write-behind', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановка потока и финальный сброс буфера"""
+        if self._thread:
+            self._stop.set(); self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        # Буфер забирается под общей блокировкой: иначе delete_user + add_user между обменом
+        # буфера и применением пачки вернули бы счетчики удаленного пользователя новому
+        with self.lock:
+            with self._buf_lock:
+                if not self._analyzes: return
+                per_user, analyzes, threats = self._per_user, self._analyzes, self._threats
+                self._per_user, self._analyzes, self._threats = {}, 0, 0
+            rows = [[uid, bucket, n, t, score_sum] for uid, buckets in per_user.items() for bucket, (n, t, score_sum) in buckets.items()]
+            write = self.panel.apply_counters(rows, analyzes, threats, deferred=True)
+        if write: write()
+
+    @property
+    def pending(self):
+        """Проверок в буфере, еще не сброшенных в панель"""
+        return self._analyzes
+
+    def log_analysis(self, uid, score):
+        uid, score, bucket = str(uid), int(score), risk_bucket()
+        threat = score >= THREAT_SCORE
+        with self._buf_lock:
+            acc = self._per_user.setdefault(uid, {}).setdefault(bucket, [0, 0, 0])
+            acc[0] += 1; acc[1] += threat; acc[2] += score
+            self._analyzes += 1
+            if threat: self._threats += 1
+            full = self._analyzes >= self.max_pending
+        if full:
+            if self._thread: self._wake.set()
+            else: self.flush()
+
+    def delete_user(self, uid):
+        """Удаление вместе с несброшенными счетчиками пользователя (общие счетчики остаются, как в панели)"""
+        with self.lock:
+            with self._buf_lock: self._per_user.pop(str(uid), None)
+            self.panel.delete_user(uid)
+
+    def get_user(self, uid):
+        with self.lock: u = self.panel.get_user(uid)
+        pending = sum(acc[0] for acc in self._per_user.get(str(uid), {}).values())
+        return {**u, 'analyzes': u['analyzes'] + pending} if u and pending else u
+
+    def get_stats(self):
+        with self.lock: s = self.panel.get_stats()
+        return {**s, 'analyzes': s['analyzes'] + self._analyzes, 'threats': s['threats'] + self._threats}
+
+    def get_admin_report(self):
+        s = self.get_stats()
+        return {'summary': {'total_users': s['users'], 'total_analyzes': s['analyzes'], 'threats_detected': s['threats'], 'blocked_users': s['blocked_users']}}
+
+    def close(self):
+        self.stop()
+        with self.lock: self.panel.close()
+
+    def __getattr__(self, name):
+        attr = getattr(self.panel, name)
+        if not callable(attr): return attr
+        def locked(*args, **kwargs):
+            with self.lock: return attr(*args, **kwargs)
+        return locked
+
+
+def open_admin_panel(storage='json', db=None, shared=False):
+    """Создание панели по типу хранилища: json | journal | sqlite (shared - база общая для нескольких процессов)"""
+    if shared and storage != 'sqlite': raise ValueError(f"Хранилище {storage} не поддерживает несколько процессов: нужно sqlite")
+    if storage == 'json': return AdminPanel(db or 'aegis_users.json')
+    if storage == 'journal': return JournaledAdminPanel(db or 'aegis_users.json')
+    if storage == 'sqlite':
+        from admin_sqlite import SQLiteAdminPanel
+        return SQLiteAdminPanel(db or 'aegis_users.db', shared=shared)
+    raise ValueError(f"Неизвестное хранилище: {storage}")
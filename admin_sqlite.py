@@ -0,0 +1,204 @@
+import json, os, sqlite3, sys
+from datetime import datetime
+from admin_index import RISK_BUCKETS, THREAT_SCORE, ActivityIndex, new_ring, risk_bucket
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (uid INTEGER PRIMARY KEY, username TEXT, name TEXT, joined TEXT, analyzes INTEGER NOT NULL DEFAULT 0,
+                                  risk TEXT, last_threat INTEGER);
+CREATE INDEX IF NOT EXISTS users_by_analyzes ON users (analyzes DESC, uid);
+CREATE TABLE IF NOT EXISTS blocked_users (uid INTEGER PRIMARY KEY, user_id, reason TEXT, date TEXT);
+CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO stats VALUES ('analyzes', 0), ('threats', 0), ('users', 0), ('blocked_users', 0);
+-- risk - кольцо корзин риска (JSON, см. admin_index), last_threat - корзина последней угрозы
+-- Счетчики строк ведутся триггерами: count(*) по миллиону строк не нужен
+CREATE TRIGGER IF NOT EXISTS users_ins AFTER INSERT ON users BEGIN UPDATE stats SET value = value + 1 WHERE key = 'users'; END;
+CREATE TRIGGER IF NOT EXISTS users_del AFTER DELETE ON users BEGIN UPDATE stats SET value = value - 1 WHERE key = 'users'; END;
+CREATE TRIGGER IF NOT EXISTS blocked_ins AFTER INSERT ON blocked_users BEGIN UPDATE stats SET value = value + 1 WHERE key = 'blocked_users'; END;
+CREATE TRIGGER IF NOT EXISTS blocked_del AFTER DELETE ON blocked_users BEGIN UPDATE stats SET value = value - 1 WHERE key = 'blocked_users'; END;
+"""
+
+USER_COLS = "uid, username, name, joined, analyzes"
+# UPSERT вместо INSERT OR REPLACE: REPLACE не вызывает триггер удаления и сбивает счетчики
+UPSERT_USER = (f"INSERT INTO users ({USER_COLS}, risk, last_threat) VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (uid) DO UPDATE SET "
+               "username = excluded.username, name = excluded.name, joined = excluded.joined, analyzes = excluded.analyzes, "
+               "risk = excluded.risk, last_threat = excluded.last_threat")
+UPSERT_BLOCKED = ("INSERT INTO blocked_users (uid, user_id, reason, date) VALUES (?, ?, ?, ?) ON CONFLICT (uid) DO UPDATE SET "
+                  "user_id = excluded.user_id, reason = excluded.reason, date = excluded.date")
+
+
+def _user(row):
+    if row is None: return None
+    return {'user_id': str(row[0]), 'username': row[1], 'name': row[2], 'joined': row[3], 'analyzes': row[4]}
+
+
+def _last_threat(ring):
+    """Последняя корзина кольца с угрозами (None - угроз нет)"""
+    return max((ring[i] for i in range(0, len(ring), 4) if ring[i + 2]), default=None)
+
+
+def _blocked(row):
+    return {'user_id': row[0], 'reason': row[1], 'date': row[2]}
+
+
+class SQLiteAdminPanel:
+    """AdminPanel поверх SQLite (WAL): тот же интерфейс, но без загрузки всей базы в память.
+
+    shared=True - база общая для нескольких процессов (см. aegis_workers): кольца риска
+    читаются из базы внутри транзакции записи, а рейтинг риска строится по базе при чтении.
+    Записи идут транзакциями BEGIN IMMEDIATE, конкурентные писатели ждут до busy_timeout.
+    """
+
+    def __init__(self, db='aegis_users.db', shared=False, busy_timeout=10000):
+        self.db = db
+        self.shared = shared
+        self.busy_timeout = busy_timeout
+        self.load()
+
+    def load(self):
+        self.conn = sqlite3.connect(self.db, isolation_level=None, check_same_thread=False)
+        self.conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # Базы до индексов риска: колонки добавляются на месте (одной транзакцией - процессы стартуют одновременно)
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            cols = {r[1] for r in self.conn.execute("PRAGMA table_info(users)")}
+            for col, kind in (('risk', 'TEXT'), ('last_threat', 'INTEGER')):
+                if col not in cols: self.conn.execute(f"ALTER TABLE users ADD COLUMN {col} {kind}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS users_by_last_threat ON users (last_threat) WHERE last_threat IS NOT NULL")
+        self._load_risk()
+
+    def _load_risk(self):
+        """В памяти - только кольца пользователей с угрозами в окне (частичный индекс по last_threat)"""
+        self.index = ActivityIndex()
+        for uid, risk in self.conn.execute("SELECT uid, risk FROM users WHERE last_threat > ?", (risk_bucket() - RISK_BUCKETS,)):
+            self.index.track(uid, json.loads(risk))
+
+    def save(self): pass  # каждое изменение уже зафиксировано
+
+    def add_user(self, uid, username, first_name):
+        uid = int(uid)
+        if self.is_blocked(uid): return False
+        self.conn.execute("INSERT OR IGNORE INTO users (uid, username, name, joined, analyzes) VALUES (?, ?, ?, ?, 0)",
+                          (uid, username, first_name, str(datetime.now())))
+        return True
+
+    def _count(self, rows):
+        """Приращения (uid, корзина, проверок, угроз, сумма score) внутри открытой транзакции.
+        Строки одного uid (разные корзины) копятся в одном кольце: кольцо читается из базы
+        один раз за вызов, а пишется одним UPDATE на пользователя."""
+        rings, counts = {}, {}
+        for uid, bucket, n, threats, score_sum in rows:
+            uid = int(uid)
+            ring = rings.get(uid)
+            if ring is None:
+                ring = None if self.shared else self.index.ring(uid)
+                if ring is None:
+                    row = self.conn.execute("SELECT risk FROM users WHERE uid = ?", (uid,)).fetchone()
+                    if row is None: continue
+                    ring = json.loads(row[0]) if row[0] else new_ring()
+                rings[uid] = ring
+            self.index.add(uid, ring, bucket, n, threats, score_sum)
+            counts[uid] = counts.get(uid, 0) + n
+        self.conn.executemany("UPDATE users SET analyzes = analyzes + ?, risk = ?, last_threat = ? WHERE uid = ?",
+                              [(counts[uid], json.dumps(ring, separators=(',', ':')), _last_threat(ring), uid) for uid, ring in rings.items()])
+
+    def log_analysis(self, uid, score):
+        """Учет проверки с итоговым score (угроза - score >= THREAT_SCORE)"""
+        threat = int(score) >= THREAT_SCORE
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._count([(uid, risk_bucket(), 1, int(threat), int(score))])
+            self.conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'analyzes'")
+            if threat: self.conn.execute("UPDATE stats SET value = value + 1 WHERE key = 'threats'")
+
+    def apply_counters(self, rows, analyzes, threats, deferred=False):
+        """Пачка приращений одной транзакцией (для WriteBehindPanel): rows - [uid, корзина, проверок, угроз, сумма score].
+        Транзакция и есть запись: откладывать нечего, deferred ничего не меняет."""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._count(rows)
+            self.conn.execute("UPDATE stats SET value = value + ? WHERE key = 'analyzes'", (analyzes,))
+            self.conn.execute("UPDATE stats SET value = value + ? WHERE key = 'threats'", (threats,))
+
+    def delete_user(self, uid):
+        self.conn.execute("DELETE FROM users WHERE uid = ?", (int(uid),))
+        self.index.forget(int(uid))
+
+    def get_user(self, uid):
+        return _user(self.conn.execute(f"SELECT {USER_COLS} FROM users WHERE uid = ?", (int(uid),)).fetchone())
+
+    def get_stats(self):
+        s = dict(self.conn.execute("SELECT key, value FROM stats").fetchall())
+        return {'users': s['users'], 'analyzes': s['analyzes'], 'threats': s['threats'], 'blocked_users': s['blocked_users']}
+
+    def block_user(self, uid, reason="Ban"):
+        self.conn.execute(UPSERT_BLOCKED, (int(uid), uid, reason, str(datetime.now())))
+
+    def unblock_user(self, uid): self.conn.execute("DELETE FROM blocked_users WHERE uid = ?", (int(uid),))
+
+    def is_blocked(self, uid):
+        return self.conn.execute("SELECT 1 FROM blocked_users WHERE uid = ?", (int(uid),)).fetchone() is not None
+
+    def get_blocked_users(self):
+        return [_blocked(r) for r in self.conn.execute("SELECT user_id, reason, date FROM blocked_users ORDER BY uid")]
+
+    # === СТРАНИЦЫ ДЛЯ АДМИНКИ (keyset-пагинация по первичному ключу) ===
+    def get_users_page(self, after=None, limit=10):
+        rows = self.conn.execute(f"SELECT {USER_COLS} FROM users WHERE uid > ? ORDER BY uid LIMIT ?",
+                                 (-1 if after is None else int(after), limit))
+        return [_user(r) for r in rows]
+
+    def get_blocked_page(self, after=None, limit=10):
+        rows = self.conn.execute("SELECT user_id, reason, date FROM blocked_users WHERE uid > ? ORDER BY uid LIMIT ?",
+                                 (-1 if after is None else int(after), limit))
+        return [_blocked(r) for r in rows]
+
+    def get_top_users(self, limit=5):
+        rows = self.conn.execute(f"SELECT {USER_COLS} FROM users ORDER BY analyzes DESC, uid LIMIT ?", (limit,))
+        return [_user(r) for r in rows]
+
+    def get_risky_users(self, limit=10):
+        """Самые рискованные за скользящее окно: угрозы, затем средний score"""
+        if self.shared: self._load_risk()  # кольца пишут и другие процессы
+        result = []
+        for uid, threats, avg in self.index.risky(limit):
+            user = self.get_user(uid)
+            if user: result.append({**user, 'threats': threats, 'avg_score': avg})
+        return result
+
+    def get_admin_report(self):
+        s = self.get_stats()
+        return {'summary': {'total_users': s['users'], 'total_analyzes': s['analyzes'], 'threats_detected': s['threats'], 'blocked_users': s['blocked_users']}}
+
+    def close(self): self.conn.close()
+
+
+def migrate_json(json_path='aegis_users.json', db_path='aegis_users.db', batch=50000):
+    """Одноразовый перенос JSON-базы (вместе с журналом, если он есть) в SQLite"""
+    from admin_panel import AdminPanel, JournaledAdminPanel
+    if not os.path.exists(json_path): raise FileNotFoundError(json_path)
+    src = JournaledAdminPanel(json_path) if os.path.exists(json_path + '.journal') else AdminPanel(json_path)
+    dst = SQLiteAdminPanel(db_path)
+    risk = src.users.risk
+    users = ((uid, u['username'], u['name'], u['joined'], u['analyzes'],
+              json.dumps(risk[uid], separators=(',', ':')) if uid in risk else None, _last_threat(risk.get(uid, ())))
+             for uid, u in src.users.items())
+    with dst.conn:
+        dst.conn.execute("BEGIN")
+        while True:
+            chunk = [row for _, row in zip(range(batch), users)]
+            if not chunk: break
+            dst.conn.executemany(UPSERT_USER, chunk)
+        dst.conn.executemany(UPSERT_BLOCKED, [(int(uid), b.get('user_id', uid), b.get('reason'), b.get('date')) for uid, b in src.blocked.items()])
+        dst.conn.execute("UPDATE stats SET value = ? WHERE key = 'analyzes'", (src.d['stats']['analyzes'],))
+        dst.conn.execute("UPDATE stats SET value = ? WHERE key = 'threats'", (src.d['stats']['threats'],))
+    stats = dst.get_stats()
+    src.close(); dst.close()
+    return stats
+
+
+if __name__ == '__main__':
+    # python admin_sqlite.py [aegis_users.json] [aegis_users.db]
+    print(migrate_json(*sys.argv[1:3]))
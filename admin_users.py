@@ -0,0 +1,148 @@
+from array import array
+from datetime import datetime
+import base64
+import sys
+
+def _timestamp(joined) -> float:
+    """Строка str(datetime) -> unix-время; нечитаемое значение хранится как NaN"""
+    if isinstance(joined, (int, float)): return float(joined)
+    try: return datetime.fromisoformat(joined).timestamp()
+    except (TypeError, ValueError): return float('nan')
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _pack(column: array) -> str:
+    return base64.b64encode(column.tobytes()).decode('ascii')
+
+
+def _unpack(typecode: str, data: str, byteorder: str) -> array:
+    column = array(typecode)
+    column.frombytes(base64.b64decode(data))
+    if byteorder != sys.byteorder: column.byteswap()  # снимок с машины другой архитектуры
+    return column
+
+
+class UserTable:
+    """Компактная таблица пользователей: колонки вместо словаря на запись.
+
+    uid, счетчик проверок и время регистрации лежат в array (8 байт на значение), имена -
+    в списках интернированных строк (одинаковые имена - один объект). Строка пользователя
+    ищется по целому uid через словарь uid -> номер строки; удаление переносит последнюю
+    строку на место удаленной, поэтому все операции O(1). Кольца риска (admin_index)
+    хранятся отдельно и только у пользователей, которые что-то проверяли.
+    """
+
+    def __init__(self):
+        self._row = {}              # uid -> номер строки
+        self._uid = array('q')
+        self._analyzes = array('q')
+        self._joined = array('d')
+        self._username = []
+        self._name = []
+        self.risk = {}              # uid -> кольцо корзин риска
+
+    def __len__(self): return len(self._uid)
+
+    def __contains__(self, uid): return int(uid) in self._row
+
+    def ids(self): return iter(self._uid)
+
+    def add(self, uid, username, name, joined=None, analyzes=0):
+        uid = int(uid)
+        if uid in self._row: return False
+        self._row[uid] = len(self._uid)
+        self._uid.append(uid)
+        self._analyzes.append(analyzes)
+        self._joined.append(datetime.now().timestamp() if joined is None else _timestamp(joined))
+        self._username.append(_intern(username))
+        self._name.append(_intern(name))
+        return True
+
+    def remove(self, uid):
+        uid = int(uid)
+        i = self._row.pop(uid, None)
+        if i is None: return False
+        last = len(self._uid) - 1
+        if i != last:
+            moved = self._uid[last]
+            self._row[moved] = i
+            for col in (self._uid, self._analyzes, self._joined, self._username, self._name): col[i] = col[last]
+        for col in (self._uid, self._analyzes, self._joined, self._username, self._name): col.pop()
+        self.risk.pop(uid, None)
+        return True
+
+    def incr(self, uid, n=1):
+        """Прибавка к счетчику проверок; новое значение или None, если пользователя нет"""
+        i = self._row.get(uid)
+        if i is None: return None
+        self._analyzes[i] += n
+        return self._analyzes[i]
+
+    def get(self, uid):
+        """Запись в прежнем виде словаря (собирается на лету)"""
+        i = self._row.get(int(uid))
+        return None if i is None else self._record(i)
+
+    def _record(self, i):
+        joined = self._joined[i]
+        return {'user_id': str(self._uid[i]), 'username': self._username[i], 'name': self._name[i],
+                'joined': None if joined != joined else str(datetime.fromtimestamp(joined)), 'analyzes': self._analyzes[i]}
+
+    def items(self):
+        """(uid, запись) по всем пользователям"""
+        return ((uid, self._record(i)) for i, uid in enumerate(self._uid))
+
+    def counts(self):
+        """(uid, проверок) по всем пользователям - для пересборки топа"""
+        return zip(self._uid, self._analyzes)
+
+    def copy(self) -> 'UserTable':
+        """Копия колонок (десятки мс на миллион строк) для записи снимка из другого потока.
+        Кольца риска общие: их меняет только сброс счетчиков, а он идет в потоке записи."""
+        table = UserTable()
+        table._row = self._row.copy()
+        table._uid, table._analyzes, table._joined = self._uid[:], self._analyzes[:], self._joined[:]
+        table._username, table._name = self._username[:], self._name[:]
+        table.risk = self.risk.copy()
+        return table
+
+    # === СНИМОК ===
+    def dump(self) -> dict:
+        """Упакованный снимок: числовые колонки - base64 от байтов array, имена - словарь уникальных
+        значений и коды. Такой снимок парсится и пишется в разы быстрее списков чисел и строк."""
+        names = {}
+        codes = array('I', [names.setdefault(name, len(names)) for name in self._name])
+        return {'byteorder': sys.byteorder, 'uid': _pack(self._uid), 'analyzes': _pack(self._analyzes),
+                'joined': _pack(self._joined), 'username': self._username, 'names': list(names), 'name': _pack(codes),
+                'risk': self.risk}
+
+    @classmethod
+    def load(cls, data) -> 'UserTable':
+        """Из упакованного снимка, из колонок-списков или из старого формата {uid: {...}}"""
+        table = cls()
+        if isinstance(data.get('uid'), str):
+            order = data['byteorder']
+            table._uid = _unpack('q', data['uid'], order)
+            table._analyzes = _unpack('q', data['analyzes'], order)
+            table._joined = _unpack('d', data['joined'], order)
+            table._username = data['username']  # username уникален в Telegram: интернировать нечего
+            names = [_intern(v) for v in data['names']]
+            table._name = [names[code] for code in _unpack('I', data['name'], order)]
+            table._row = dict(zip(table._uid, range(len(table._uid))))
+            table.risk = {int(uid): ring for uid, ring in data.get('risk', {}).items()}
+        elif isinstance(data.get('uid'), list):
+            table._uid = array('q', data['uid'])
+            table._analyzes = array('q', data['analyzes'])
+            table._joined = array('d', (float('nan') if t is None else t for t in data['joined']))
+            table._username = [_intern(v) for v in data['username']]
+            table._name = [_intern(v) for v in data['name']]
+            table._row = dict(zip(data['uid'], range(len(table._uid))))
+            table.risk = {int(uid): ring for uid, ring in data.get('risk', {}).items()}
+        else:
+            for uid, u in data.items():
+                table.add(uid, u.get('username'), u.get('name'), u.get('joined'), u.get('analyzes', 0))
+                if 'risk' in u: table.risk[int(uid)] = u['risk']
+        return table
@@ -1,274 +1,309 @@
-from typing import Dict, List
+from bisect import bisect_right
+from typing import Dict, List, Optional, Union
+import logging
+import os
 import re
+import threading
+
+from aegis_rules import DEFAULT_RULES, GROUPS, Ruleset, load_ruleset
+
+# === УРОВНИ РИСКА (порог, уровень, эмодзи) ===
+RISK_LEVELS = [(0, "SAFE", "✅"), (25, "LOW", "🟢"), (45, "MEDIUM", "🟡"), (60, "HIGH", "🟠"), (80, "CRITICAL", "🔴")]
+_RISK_THRESHOLDS = [t for t, _, _ in RISK_LEVELS]
+
+# === АНАЛИЗ ПО ЧАСТЯМ ===
+CHUNK_SIZE = 1024
+# Части режутся по пробелу в пределах перекрытия; спецпаттерны смотрят на часть вместе с перекрытием
+_CHUNK_OVERLAP = 64
+_SPACE_RE = re.compile(r'\s')
 
 class AEGISAnalyzer:
-    """AEGIS v5.2 FINAL - ПОЛНАЯ ПЕРЕДЕЛКА С ЭМОДЗИ И НОВЫМИ ТРИГГЕРАМИ"""
+    """AEGIS v5.2 FINAL - ПОЛНАЯ ПЕРЕДЕЛКА С ЭМОДЗИ И НОВЫМИ ТРИГГЕРАМИ
+
+    Правила (триггеры, комбо, спецпаттерны, типы угроз) живут в aegis_rules.json и
+    компилируются в неизменяемый Ruleset. watch() следит за файлом и атомарно подменяет
+    набор правил: идущие проверки дорабатывают на старой версии.
+    """
     
-    def __init__(self):
-        # === КРИТИЧНЫЕ ТРИГГЕРЫ (Вес 30-35) ===
-        self.critical_triggers = {
-            'credentials': {
-                'weight': 30,
-                'keywords': ['пароль', 'пин', 'код', 'реквизит', 'пин-код', 'cvv', 'cvc', 'карта', 'реквизиты', 'логин', 'username', 'password', 'пароль', 'пин код', 'код подтверждения']
-            },
-            'malware': {
-                'weight': 35,
-                'keywords': ['.exe', '.bat', '.scr', '.msi', '.dll', '.com', '.zip', '.rar', 'скачай', 'скачаи', 'установи', 'скачайте', 'исполняемый', 'файл exe', 'скачать файл']
-            },
-            'otp': {
-                'weight': 32,
-                'keywords': ['код из sms', 'код из смс', 'sms код', '2fa', 'двухфакторная', 'одноразовый код', 'отправь код', 'коды доступа', 'код подтверждения', 'проверка', 'верификация']
-            },
-            'banking': {
-                'weight': 28,
-                'keywords': ['сбербанк', 'альфа', 'райффайзен', 'втб', 'газпромбанк', 'яндекс касса', 'тинькофф', 'мегабанк', 'номер карты', 'номер счета', 'счет', 'карта 4']
-            },
-            'fake_authority': {
-                'weight': 28,
-                'keywords': ['мвд', 'фсб', 'налоговая', 'центробанк', 'полиция', 'прокуратура', 'суд', 'следствие', 'пристав', 'арест', 'судебный', 'уголовное']
-            }
-        }
-        
-        # === СОЦИАЛЬНАЯ ИНЖЕНЕРИЯ (Вес 25-32) ===
-        self.social_engineering = {
-            'family_scam': {
-                'weight': 32,
-                'keywords': ['мам', 'мама', 'папа', 'батя', 'бабушка', 'дедушка', 'брат', 'сестра', 'тетя', 'дядя', 'я в беде', 'помоги мне', 'срочно нужны деньги', 'новый номер', 'телефон упал', 'потерял телефон', 'старый номер']
-            },
-            'friend_scam': {
-                'weight': 30,
-                'keywords': ['друг', 'одноклассник', 'однокурсник', 'коллега', 'напарник', 'это я', 'узнаешь', 'я застрял', 'я в беде', 'скинь срочно', 'помощь нужна', 'бро', 'брат', 'чувак']
-            },
-            'baiting_media': {
-                'weight': 28,
-                'keywords': ['фото', 'видео про тебя', 'выложили', 'группе', 'вк', 'инстаграм', 'тик ток', 'удали пока', 'посмотри что', 'ого', 'жесть', 'ужас', 'компромат']
-            },
-            'job_scam': {
-                'weight': 26,
-                'keywords': ['работа', 'вакансия', 'удаленно', 'заработок', 'быстрые деньги', 'подработка', '50000', '100000', 'деньги каждый день', 'без опыта', 'домашняя работа']
-            },
-            'romance_scam': {
-                'weight': 25,
-                'keywords': ['люблю', 'девушка', 'парень', 'красивая', 'тебе нравлюсь', 'между нами', 'влюбился', 'ты нравишься', 'свидание', 'встреча', 'единственный']
-            },
-            'bec': {
-                'weight': 31,
-                'keywords': ['директор', 'генеральный', 'начальник', 'босс', 'это я', 'не звони', 'конфиденциально', 'никому не говори', 'срочный платеж', 'контракт срывается', 'в самолете', 'интернет плохой']
-            }
-        }
+    def __init__(self, rules: Union[str, Ruleset, None] = None, bounded: bool = False, budget: Optional[int] = None):
+        self.rules_path = rules if isinstance(rules, str) else DEFAULT_RULES
+        # bounded=True: тексты длиннее CHUNK_SIZE идут через analyze_bounded (ранний выход, бюджет budget символов)
+        self.bounded = bounded
+        self.budget = budget
+        self._watcher = None
+        self._stop_watch = threading.Event()
+        self._set_ruleset(rules if isinstance(rules, Ruleset) else load_ruleset(self.rules_path))
+    
+    def _set_ruleset(self, ruleset: Ruleset):
+        """Подмена правил одной ссылкой + изменяемые копии словарей для обратной совместимости"""
+        self.ruleset = ruleset
+        data = ruleset.to_data()
+        self.critical_triggers, self.social_engineering, self.phishing, self.regional = (data['groups'][g] for g in GROUPS)
+        self.combo_rules = [(set(rule['categories']), rule['bonus']) for rule in data['combo_rules']]
+        self.threat_type_map = data['threat_type_map']
+    
+    def _compile(self):
+        """Сборка нового Ruleset из (возможно измененных) словарей анализатора"""
+        data = self.ruleset.to_data()
+        data['groups'] = dict(zip(GROUPS, (self.critical_triggers, self.social_engineering, self.phishing, self.regional)))
+        if [(frozenset(cats), bonus) for cats, bonus in self.combo_rules] != list(self.ruleset.combo_rules):
+            data['combo_rules'] = [{'categories': sorted(cats), 'bonus': bonus} for cats, bonus in self.combo_rules]
+        data['threat_type_map'] = self.threat_type_map
+        self._set_ruleset(Ruleset(data))
+    
+    @property
+    def rules_version(self) -> str:
+        """Отпечаток правил: меняется при любой правке (по нему сбрасывается кэш вердиктов)"""
+        return self.ruleset.version
+    
+    # === ГОРЯЧАЯ ПЕРЕЗАГРУЗКА ===
+    def reload(self) -> bool:
+        """Перечитать файл правил; True, если версия сменилась"""
+        ruleset = load_ruleset(self.rules_path)
+        if ruleset.version == self.ruleset.version:
+            return False
+        self._set_ruleset(ruleset)
+        logging.info("AEGIS: правила обновлены до %s", ruleset.version[:12])
+        return True
+    
+    def watch(self, interval: float = 2.0):
+        """Фоновый опрос файла правил; битый файл пропускается, работают прежние правила"""
+        if self._watcher: return
         
-        # === ФИШИНГ И ССЫЛКИ (Вес 22-28) ===
-        self.phishing = {
-            'suspicious_links': {
-                'weight': 28,
-                'keywords': ['bit.ly', 'tinyurl', '.xyz', '.tk', '.ml', '.ga', '.cf', '.online', 'verify', 'confirm', 'login', 'update', '-bank', '-account', 'secure-', 'official-']
-            },
-            'urgency': {
-                'weight': 24,
-                'keywords': ['срочно', 'спешит', 'скорее', 'быстрее', '24 часа', '1 час', '2 часа', '30 минут', 'не поздно', 'немедленно', 'немедля', 'сейчас', 'срок']
-            },
-            'threat_pressure': {
-                'weight': 26,
-                'keywords': ['заблокирован', 'отключу', 'удалю', 'заморозю', 'арестую', 'штраф', 'суд', 'уголовное', '115-фз', 'передам фсб', 'полиция']
-            },
-            'financial_lure': {
-                'weight': 22,
-                'keywords': ['деньги', 'рубли', 'доллар', 'евро', 'криптовалюта', 'биткоин', 'ton', 'приз', 'выигрыш', 'лотерея', 'бонус', 'скидка', 'перевод']
-            }
-        }
+        def stamp():
+            try:
+                st = os.stat(self.rules_path)
+                return st.st_mtime_ns, st.st_size
+            except OSError:
+                return None
         
-        # === РЕГИОНАЛЬНЫЕ (Вес 16-20) ===
-        self.regional = {
-            'messaging_apps': {
-                'weight': 18,
-                'keywords': ['telegram', 'телеграм', 'вконтакте', 'вк', 'whatsapp', 'viber', 'discord', 'телегра']
-            },
-            'marketplaces': {
-                'weight': 16,
-                'keywords': ['авито', 'озон', 'wildberries', 'яндекс.маркет', 'aliexpress', 'ebay', 'steam', 'wb-', 'cdek']
-            },
-            'payment_systems': {
-                'weight': 20,
-                'keywords': ['яндекс касса', 'яндекс кошелек', 'qiwi', 'webmoney', 'yandex', 'sberbank', 'tinkoff', '2pay', 'юнистрим']
-            }
-        }
+        def run():
+            seen = stamp()
+            while not self._stop_watch.wait(interval):
+                current = stamp()
+                if current is None or current == seen: continue
+                seen = current
+                try: self.reload()
+                except (OSError, ValueError) as e: logging.error("AEGIS: правила %s не загружены: %s", self.rules_path, e)
         
-        # === КАРТОЧКА ВЫВОДОВ ===
-        self.threat_type_map = {
-            'family_scam': '👨‍👩‍👧 Семейный скам',
-            'friend_scam': '👥 Скам "друг в беде"',
-            'bec': '💼 BEC-атака',
-            'malware': '🦠 Вредонос',
-            'suspicious_links': '🎣 Фишинг',
-            'banking': '🏦 Банковский скам',
-            'credentials': '🔑 Кража данных',
-            'baiting_media': '📸 Приманка медиа',
-            'job_scam': '💼 Скам вакансия',
-            'fake_authority': '👮 Подделка власти',
-            'otp': '📲 Кража OTP',
-            'threat_pressure': '⚖️ Угрозы',
-            'financial_lure': '💰 Финансовая приманка'
-        }
+        self._stop_watch.clear()
+        self._watcher = threading.Thread(target=run, name='aegis-rules-watch', daemon=True)
+        self._watcher.start()
+    
+    def stop_watch(self):
+        if self._watcher:
+            self._stop_watch.set()
+            self._watcher.join()
+            self._watcher = None
     
     def analyze(self, text: str) -> Dict:
         """ОСНОВНОЙ АНАЛИЗ"""
+        if self.bounded and len(text) > CHUNK_SIZE:
+            return self.analyze_bounded(text, self.budget)
+        rules = self.ruleset  # одна версия правил на всю проверку
         text_lower = text.lower()
         text_length = len(text)
         
         # === ПОИСК ТРИГГЕРОВ ===
-        detected_triggers = self._find_triggers(text_lower)
+        detected_triggers = self._find_triggers(text_lower, rules)
         detected_categories = self._get_categories(detected_triggers)
         
         # === БАЗОВЫЙ SCORE ===
         base_score = sum([t['weight'] for t in detected_triggers])
         
         # === КОМБО-БОНУСЫ ===
-        combo_bonus = self._calculate_combo_bonus(detected_categories)
+        combo_bonus = self._calculate_combo_bonus(detected_categories, rules)
         
         # === СПЕЦИАЛЬНЫЕ ПАТТЕРНЫ ===
-        special_bonus = self._special_patterns(text_lower)
+        special_bonus = self._special_patterns(text_lower, rules)
         
         # === SHORT_MESSAGE_BOOST ===
         short_boost = self._short_message_boost(detected_triggers, text_length)
         
-        # === ФИНАЛЬНЫЙ SCORE ===
+        return self._build_result([t['name'] for t in detected_triggers], detected_categories,
+                                  base_score, combo_bonus, special_bonus, short_boost, rules)
+    
+    def analyze_batch(self, texts: List[str], with_triggers: bool = False) -> List[Dict]:
+        """ПАКЕТНЫЙ АНАЛИЗ: результат совпадает с analyze() для каждого сообщения
+        (with_triggers=True добавляет полный список имен триггеров в 'triggers')"""
+        texts = list(texts)
+        if self.bounded and any(len(t) > CHUNK_SIZE for t in texts):
+            rest = iter(self.analyze_batch([t for t in texts if len(t) <= CHUNK_SIZE], with_triggers))
+            return [self.analyze_bounded(t, self.budget, with_triggers=with_triggers) if len(t) > CHUNK_SIZE else next(rest)
+                    for t in texts]
+        rules = self.ruleset
+        lowered = [t.lower() for t in texts]
+        
+        # === МАТРИЦА СООБЩЕНИЕ x ТРИГГЕР (CSR: строки отсортированных индексов) ===
+        find, keyword_entries = rules.matcher.find, rules.keyword_entries
+        rows = []
+        for text_lower in lowered:
+            hits = find(text_lower)
+            rows.append(sorted(i for k in hits for i in keyword_entries[k]) if hits else [])
+        
+        # === БАЗОВЫЙ SCORE: строка матрицы x вектор весов ===
+        weights, entry_bits = rules.entry_weights, rules.entry_bits
+        base_scores = [sum([weights[i] for i in row]) for row in rows]
+        
+        # === КОМБО: битовая маска категорий на сообщение ===
+        masks = []
+        for row in rows:
+            mask = 0
+            for i in row:
+                mask |= entry_bits[i]
+            masks.append(mask)
+        combo_masks = rules.combo_masks
+        combo_bonuses = [sum([bonus for need, bonus in combo_masks if mask & need == need]) for mask in masks]
+        
+        # === СПЕЦИАЛЬНЫЕ ПАТТЕРНЫ + SHORT BOOST ===
+        special_bonuses = [self._special_patterns(text_lower, rules) for text_lower in lowered]
+        short_boosts = [self._short_message_boost(row, len(text)) for row, text in zip(rows, texts)]
+        
+        entries = rules.entries
+        results = []
+        for row, base, combo, special, short in zip(rows, base_scores, combo_bonuses, special_bonuses, short_boosts):
+            names = [entries[i][0] for i in row]
+            categories = dict.fromkeys([entries[i][2] for i in row])
+            result = self._build_result(names, categories, base, combo, special, short, rules)
+            if with_triggers:
+                result['triggers'] = names
+            results.append(result)
+        return results
+    
+    def analyze_bounded(self, text: str, budget: Optional[int] = None, chunk_size: int = CHUNK_SIZE,
+                        with_triggers: bool = False) -> Dict:
+        """АНАЛИЗ ПО ЧАСТЯМ С ОГРАНИЧЕННОЙ СТОИМОСТЬЮ
+
+        Текст просматривается частями по ~chunk_size символов (граница - пробел): автомат
+        продолжает с состояния предыдущей части, спецпаттерны проверяются на части с перекрытием.
+        Все слагаемые score только растут, поэтому как только min(100, ...) достиг 100, score и
+        уровень риска уже не изменятся - остаток не читается ('early_exit': True; триггеры, тип
+        угрозы и уверенность тогда посчитаны по прочитанной части). budget - жесткий предел
+        символов на сообщение ('budget_cut': True, если текст обрезан). Без обрыва вердикт
+        совпадает с analyze().
+        """
+        rules = self.ruleset
+        text_lower = (text if budget is None else text[:budget]).lower()
+        n = len(text_lower)
+        feed, keyword_entries, weights = rules.matcher.feed, rules.keyword_entries, rules.entry_weights
+        special = rules.special
+        hits, state = rules.matcher.find(''), 0
+        found, counts, resume, groups = [False] * len(special), [0] * len(special), [0] * len(special), [set() for _ in special]
+        special_bonus, start, early_exit = 0, 0, False
+        
+        while start < n:
+            end = start + chunk_size
+            if end < n:
+                m = _SPACE_RE.search(text_lower, end, end + _CHUNK_OVERLAP)
+                if m: end = m.end()
+            else:
+                end = n
+            state = feed(text_lower[start:end], state, hits)
+            
+            # === СПЕЦИАЛЬНЫЕ ПАТТЕРНЫ НА ЧАСТИ (с перекрытием в обе стороны) ===
+            # Без пробела рядом часть кончается посреди токена, а endpos для регулярки - конец строки
+            # (\b сработал бы внутри числа). Поэтому ищем до hi, но считаем только совпадения,
+            # начавшиеся до end: остальные найдет следующая часть.
+            lo, hi = max(0, start - _CHUNK_OVERLAP), min(n, end + _CHUNK_OVERLAP)
+            window = text_lower[lo:hi]
+            for k, p in enumerate(special):
+                if found[k]: continue
+                if p.words:
+                    groups[k].update(g for g, group in enumerate(p.words) if g not in groups[k] and any(w in window for w in group))
+                    hit = len(groups[k]) == len(p.words)
+                elif p.prefilter and not any(z in window for z in p.prefilter):
+                    hit = False
+                elif p.min_count > 1:
+                    for m in p.regex.finditer(text_lower, max(resume[k], lo), hi):
+                        if m.start() >= end: break
+                        counts[k] += 1
+                        resume[k] = m.end()
+                    hit = counts[k] >= p.min_count
+                else:
+                    m = p.regex.search(text_lower, lo, hi)
+                    hit = m is not None and m.start() < end
+                if hit:
+                    found[k] = True
+                    special_bonus += p.bonus
+            start = end
+            
+            # === РАННИЙ ВЫХОД: score уже упирается в 100 ===
+            if start < n:
+                order = sorted(i for h in hits for i in keyword_entries[h])
+                categories = dict.fromkeys([rules.entries[i][2] for i in order])
+                score = (sum([weights[i] for i in order]) + self._calculate_combo_bonus(categories, rules)
+                         + special_bonus + self._short_message_boost(order, len(text)))
+                if score >= 100:
+                    early_exit = True
+                    break
+        
+        order = sorted(i for h in hits for i in keyword_entries[h])
+        names = [rules.entries[i][0] for i in order]
+        categories = dict.fromkeys([rules.entries[i][2] for i in order])
+        result = self._build_result(names, categories, sum([weights[i] for i in order]), self._calculate_combo_bonus(categories, rules),
+                                    special_bonus, self._short_message_boost(order, len(text)), rules)
+        result['early_exit'] = early_exit
+        result['budget_cut'] = not early_exit and budget is not None and budget < len(text)
+        if with_triggers:
+            result['triggers'] = names
+        return result
+    
+    def _build_result(self, names: List[str], categories: Dict, base_score: int,
+                      combo_bonus: int, special_bonus: int, short_boost: int, rules: Ruleset) -> Dict:
+        """Финальный score, уровень риска и итоговая карточка"""
         final_score = min(100, base_score + combo_bonus + special_bonus + short_boost)
         
         # === УРОВЕНЬ РИСКА И ЭМОДЗИ ===
-        if final_score >= 80:
-            risk_level = "CRITICAL"
-            emoji = "🔴"
-        elif final_score >= 60:
-            risk_level = "HIGH"
-            emoji = "🟠"
-        elif final_score >= 45:
-            risk_level = "MEDIUM"
-            emoji = "🟡"
-        elif final_score >= 25:
-            risk_level = "LOW"
-            emoji = "🟢"
-        else:
-            risk_level = "SAFE"
-            emoji = "✅"
+        _, risk_level, emoji = RISK_LEVELS[bisect_right(_RISK_THRESHOLDS, final_score) - 1]
         
         # === ТИП УГРОЗЫ ===
-        threat_type = self._determine_threat_type(detected_categories)
-        
-        # === ФОРМАТИРОВАННЫЕ РЕЗУЛЬТАТЫ ===
-        formatted_detected = []
-        for t in detected_triggers[:8]:
-            formatted_detected.append(f"• {t['name']}")
+        threat_type = self._determine_threat_type(categories, rules)
         
         return {
             'score': int(final_score),
             'risk_level': risk_level,
             'emoji': emoji,
             'threat_type': threat_type,
-            'detected': formatted_detected,
-            'flags_count': len(detected_triggers),
-            'confidence': min(99, 50 + len(detected_triggers) * 5),
+            'detected': [f"• {name}" for name in names[:8]],
+            'flags_count': len(names),
+            'confidence': min(99, 50 + len(names) * 5),
             'base_score': int(base_score),
             'combo_bonus': combo_bonus,
             'special_bonus': special_bonus,
             'short_boost': short_boost
         }
     
-    def _find_triggers(self, text: str) -> List[Dict]:
-        """Поиск триггеров"""
-        triggers = []
-        
-        # Критичные
-        for category, data in self.critical_triggers.items():
-            for keyword in data['keywords']:
-                if keyword in text:
-                    triggers.append({
-                        'name': f"{category}: {keyword}",
-                        'weight': data['weight'],
-                        'category': category
-                    })
-        
-        # Соц. инженерия
-        for category, data in self.social_engineering.items():
-            for keyword in data['keywords']:
-                if keyword in text:
-                    triggers.append({
-                        'name': f"{category}: {keyword}",
-                        'weight': data['weight'],
-                        'category': category
-                    })
-        
-        # Фишинг
-        for category, data in self.phishing.items():
-            for keyword in data['keywords']:
-                if keyword in text:
-                    triggers.append({
-                        'name': f"{category}: {keyword}",
-                        'weight': data['weight'],
-                        'category': category
-                    })
-        
-        # Региональные
-        for category, data in self.regional.items():
-            for keyword in data['keywords']:
-                if keyword in text:
-                    triggers.append({
-                        'name': f"{category}: {keyword}",
-                        'weight': data['weight'],
-                        'category': category
-                    })
-        
-        return triggers
+    def _find_triggers(self, text: str, rules: Ruleset) -> List[Dict]:
+        """Поиск триггеров (один проход автомата, порядок как в словарях)"""
+        hits = rules.matcher.find(text)
+        if not hits:
+            return []
+        order = sorted(i for k in hits for i in rules.keyword_entries[k])
+        return [{'name': name, 'weight': weight, 'category': category}
+                for name, weight, category in (rules.entries[i] for i in order)]
     
-    def _get_categories(self, triggers: List[Dict]) -> set:
-        """Извлечение категорий"""
-        return set([t['category'] for t in triggers])
+    def _get_categories(self, triggers: List[Dict]) -> Dict:
+        """Извлечение категорий (упорядоченное множество: порядок обнаружения, а не хэшей)"""
+        return dict.fromkeys([t['category'] for t in triggers])
     
-    def _calculate_combo_bonus(self, categories: set) -> int:
+    def _calculate_combo_bonus(self, categories: Dict, rules: Ruleset) -> int:
         """Расчет комбо-бонусов"""
-        bonus = 0
-        
-        # Семья + деньги + срочно
-        if {'family_scam', 'financial_lure', 'urgency'}.issubset(categories):
-            bonus += 35
-        
-        # Вредонос + срочно
-        if {'malware', 'urgency'}.issubset(categories):
-            bonus += 40
-        
-        # Банк + крередитная карта + угроза
-        if {'banking', 'credentials', 'threat_pressure'}.issubset(categories):
-            bonus += 38
-        
-        # Фальшивая власть + деньги
-        if {'fake_authority', 'financial_lure'}.issubset(categories):
-            bonus += 36
-        
-        # Телеграм + фишинг + коды
-        if {'messaging_apps', 'suspicious_links', 'credentials'}.issubset(categories):
-            bonus += 30
-        
-        return bonus
+        return sum([bonus for cats, bonus in rules.combo_rules if cats.issubset(categories)])
     
-    def _special_patterns(self, text: str) -> int:
-        """Специальные паттерны"""
+    def _special_patterns(self, text: str, rules: Ruleset) -> int:
+        """Специальные паттерны (номер карты, кириллица в доменах, много URL, финансы + спешка)"""
         bonus = 0
-        
-        # Номер карты
-        if re.search(r'\b\d{4}\s?\d{4}\s?\d{4}\s?\d{4}\b', text):
-            bonus += 28
-        
-        # Кириллица в доменах
-        if re.search(r'[а-яё]+[.-][а-яё]+\.(xyz|tk|ml|ga|online)', text):
-            bonus += 25
-        
-        # Множественные URL
-        if len(re.findall(r'http[s]?://|www\.|\.com|\.ru', text)) >= 2:
-            bonus += 15
-        
-        # Финансы + спешка
-        if any(x in text for x in ['деньги', 'рубли', 'карта']) and any(x in text for x in ['срочно', 'спешит']):
-            bonus += 20
-        
+        for p in rules.special:
+            if p.words:
+                hit = all(any(w in text for w in group) for group in p.words)
+            elif p.prefilter and not any(z in text for z in p.prefilter):
+                hit = False
+            elif p.min_count > 1:
+                hit = len(p.regex.findall(text)) >= p.min_count
+            else:
+                hit = p.regex.search(text) is not None
+            if hit:
+                bonus += p.bonus
         return bonus
     
     def _short_message_boost(self, triggers: List[Dict], text_length: int) -> int:
@@ -282,12 +317,12 @@ class AEGISAnalyzer:
                 return 35
         return 0
     
-    def _determine_threat_type(self, categories: set) -> str:
+    def _determine_threat_type(self, categories: Dict, rules: Ruleset) -> str:
         """Определение типа угрозы"""
         # Ищем первый найденный тип
         for cat in categories:
-            if cat in self.threat_type_map:
-                return self.threat_type_map[cat]
+            if cat in rules.threat_type_map:
+                return rules.threat_type_map[cat]
         
         # Fallback
         return '⚠️ Неизвестная угроза'
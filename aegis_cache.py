@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import re
+import threading
+import time
+
+# === SIMHASH: 64 бита, счетчики битов упакованы в 16-битные "полосы" одного большого int ===
+_LANE = 16
+_MAX_TOKENS = 0x7FFF  # счетчик полосы + смещение не должны переполнить 16 бит
+_LANE_ONES = sum(1 << (i * _LANE) for i in range(64))
+_BIT_CHARS = bytes.maketrans(b'\x00\x01', b'01')
+_SPREAD = [[sum(((b >> j) & 1) << ((pos * 8 + j) * _LANE) for j in range(8)) for b in range(256)] for pos in range(8)]
+_BANDS = 4  # 4 полосы по 16 бит: при расстоянии <= 3 хотя бы одна полоса совпадает целиком
+_TOKEN_RE = re.compile(r'\w+')
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def fingerprint(text: str) -> tuple:
+    """Точный ключ: вердикт зависит только от text.lower() и длины исходного текста"""
+    return len(text), hashlib.blake2b(text.lower().encode('utf-8'), digest_size=16).digest()
+
+
+def simhash(text: str) -> tuple:
+    """(SimHash, число токенов) по нормализованным токенам: регистр, суммы и пробелы не важны"""
+    t0, t1, t2, t3, t4, t5, t6, t7 = _SPREAD
+    acc = n = 0
+    for token in _TOKEN_RE.findall(_DIGITS_RE.sub('0', text.lower()))[:_MAX_TOKENS]:
+        h = hash(token)
+        acc += (t0[h & 255] + t1[(h >> 8) & 255] + t2[(h >> 16) & 255] + t3[(h >> 24) & 255]
+                + t4[(h >> 32) & 255] + t5[(h >> 40) & 255] + t6[(h >> 48) & 255] + t7[(h >> 56) & 255])
+        n += 1
+    # Бит i = 1, если в полосе i счетчик > n // 2: смещаем все полосы разом так,
+    # чтобы это условие стало 15-м битом полосы, и собираем биты без цикла по 64 полосам
+    flags = ((acc + (0x8000 - n // 2 - 1) * _LANE_ONES) >> 15) & _LANE_ONES
+    bits = int(flags.to_bytes(128, 'little')[::2][::-1].translate(_BIT_CHARS), 2)
+    return bits, n
+
+
+class VerdictCache:
+    """Кэш вердиктов AEGISAnalyzer: LRU + TTL, счетчики попаданий, сброс при смене правил.
+
+    near_duplicates=True включает индекс SimHash: сообщения, отличающиеся только именами,
+    суммами или пробелами (расстояние Хэмминга <= max_distance), получают вердикт
+    представителя кластера вместо полного анализа.
+    Потокобезопасен: сам анализ идет вне блокировки.
+    """
+
+    def __init__(self, analyzer, max_size=10000, ttl=600.0, near_duplicates=False, max_distance=3,
+                 min_tokens=8, clock=time.monotonic):
+        self.analyzer = analyzer
+        self.max_size = max_size
+        self.ttl = ttl
+        self.near_duplicates = near_duplicates
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires, verdict, simhash | None)
+        self._bands = {}               # (полоса, значение) -> set(key)
+        self._version = analyzer.rules_version
+        self.hits = self.near_hits = self.misses = self.evictions = self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def analyze(self, text: str) -> Dict:
+        """Вердикт из кэша или полный анализ"""
+        key = fingerprint(text)
+        with self._lock:
+            if self.analyzer.rules_version != self._version:
+                self.clear()
+                self._version = self.analyzer.rules_version
+                self.invalidations += 1
+            version = self._version
+
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._copy(entry[1])
+                self._drop(key)
+
+        sim = None
+        if self.near_duplicates:
+            sim, tokens = simhash(text)
+            if tokens < self.min_tokens:
+                sim = None
+            else:
+                with self._lock:
+                    verdict = self._nearest(sim, now)
+                    if verdict is not None:
+                        self.near_hits += 1
+                        self._put(key, verdict, None, now)
+                        return self._copy(verdict)
+
+        verdict = self.analyzer.analyze(text)
+        with self._lock:
+            self.misses += 1
+            # Правила сменились во время анализа и кэш уже сброшен: вердикт по старым правилам не кэшируем
+            if self._version == version: self._put(key, verdict, sim, self.clock())
+        return self._copy(verdict)
+
+    def _nearest(self, sim: int, now: float) -> Optional[Dict]:
+        best, best_distance = None, self.max_distance + 1
+        for band in range(_BANDS):
+            for key in self._bands.get((band, (sim >> (band * 16)) & 0xFFFF), ()):
+                expires, verdict, other = self._entries[key]
+                if expires <= now:
+                    continue
+                distance = (sim ^ other).bit_count()
+                if distance < best_distance:
+                    best, best_distance = key, distance
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        return self._entries[best][1]
+
+    def _put(self, key, verdict: Dict, sim: Optional[int], now: float):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (now + self.ttl, verdict, sim)
+        if sim is not None:
+            for band in range(_BANDS):
+                self._bands.setdefault((band, (sim >> (band * 16)) & 0xFFFF), set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, _, sim = self._entries.pop(key)
+        if sim is not None:
+            for band in range(_BANDS):
+                bucket = self._bands.get((band, (sim >> (band * 16)) & 0xFFFF))
+                bucket.discard(key)
+                if not bucket:
+                    del self._bands[(band, (sim >> (band * 16)) & 0xFFFF)]
+
+    @staticmethod
+    def _copy(verdict: Dict) -> Dict:
+        return {**verdict, 'detected': list(verdict['detected'])}
+
+    def clear(self):
+        self._entries.clear()
+        self._bands.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import time
+
+# Результаты FloodControl.check(); None - сообщение можно анализировать
+TOO_LONG = 'too_long'   # текст длиннее max_text: отклонен без анализа
+THROTTLED = 'throttled' # ведро пусто: отказ с ответом пользователю
+SILENT = 'silent'       # ведро пусто и пользователь уже предупрежден: молча отбрасываем
+BLOCK = 'block'         # нарушений набралось на автоблокировку
+
+
+class FloodControl:
+    """Token bucket на пользователя перед анализатором.
+
+    Каждое сообщение стоит 1 + len(text) // chars_per_token жетонов, ведро пополняется со
+    скоростью rate жетонов в секунду до burst. Проверка - O(1): одно обращение к OrderedDict.
+    Записи упорядочены по последнему обращению: полные ведра (простой дольше времени полного
+    пополнения) выкидываются с головы при каждой проверке, а сверх max_users вытесняется самая
+    старая запись, так что память ограничена при любом числе уникальных отправителей.
+    Нарушения (отказы) копятся в strikes и забываются через strike_window секунд; при
+    block_after > 0 столько нарушений за окно дают BLOCK. Не потокобезопасен: вызывается из event loop.
+    """
+
+    def __init__(self, rate=0.5, burst=10.0, max_text=4096, chars_per_token=1000, max_users=100000,
+                 block_after=0, strike_window=600.0, clock=time.monotonic):
+        if rate <= 0 or burst <= 0: raise ValueError(f"FloodControl: rate и burst должны быть > 0 (rate={rate}, burst={burst})")
+        self.rate = rate
+        self.burst = burst
+        self.max_text = max_text
+        self.chars_per_token = chars_per_token
+        self.max_users = max_users
+        self.block_after = block_after
+        self.strike_window = strike_window
+        self.clock = clock
+        self.idle = burst / rate  # за это время любое ведро снова полное: запись можно забыть
+        self._users = OrderedDict()  # uid -> [жетоны, время обновления, нарушений, время последнего нарушения, предупрежден]
+        self.allowed = self.throttled = self.too_long = self.blocked = self.evictions = 0
+
+    def check(self, uid, length: int) -> Optional[str]:
+        now = self.clock()
+        users = self._users
+        entry = users.get(uid)
+        if entry is None:
+            entry = users[uid] = [self.burst, now, 0, 0.0, False]
+        else:
+            users.move_to_end(uid)
+            entry[0] = min(self.burst, entry[0] + (now - entry[1]) * self.rate)
+            entry[1] = now
+
+        # Простаивающие записи с головы (ведро уже полное, нарушения забыты) и лимит размера
+        while True:
+            uid0, oldest = next(iter(users.items()))
+            if oldest is entry or now - oldest[1] < max(self.idle, self.strike_window if oldest[2] else 0): break
+            del users[uid0]
+            self.evictions += 1
+        if len(users) > self.max_users:
+            users.popitem(last=False)
+            self.evictions += 1
+
+        if length > self.max_text:
+            self.too_long += 1
+            return self._strike(entry, now, SILENT if entry[4] else TOO_LONG)
+        cost = 1 + length // self.chars_per_token
+        if entry[0] >= cost:
+            entry[0] -= cost
+            entry[4] = False
+            self.allowed += 1
+            return None
+        self.throttled += 1
+        return self._strike(entry, now, SILENT if entry[4] else THROTTLED)
+
+    def _strike(self, entry, now: float, result: str) -> str:
+        if now - entry[3] > self.strike_window: entry[2] = 0
+        entry[2] += 1
+        entry[3] = now
+        entry[4] = True
+        if self.block_after and entry[2] >= self.block_after:
+            self.blocked += 1
+            return BLOCK
+        return result
+
+    def forget(self, uid):
+        self._users.pop(uid, None)
+
+    def __len__(self): return len(self._users)
+
+    def stats(self) -> Dict:
+        return {'users': len(self._users), 'allowed': self.allowed, 'throttled': self.throttled,
+                'too_long': self.too_long, 'blocked': self.blocked, 'evictions': self.evictions}
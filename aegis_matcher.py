@@ -0,0 +1,77 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасик: поиск всех ключевых слов за один проход по тексту"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        self.index: Dict[str, int] = {}
+
+        # === БОР ===
+        goto: List[Dict[str, int]] = [{}]
+        out: List[list] = [[]]
+        for kw in keywords:
+            if kw in self.index:
+                continue
+            self.index[kw] = len(self.keywords)
+            self.keywords.append(kw)
+            state = 0
+            for ch in kw:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(self.index[kw])
+
+        # === СУФФИКСНЫЕ ССЫЛКИ (BFS) ===
+        # trans[s] хранит только переходы, отличные от переходов корня,
+        # поэтому автомат детерминирован и не раздувается по алфавиту
+        fail = [0] * len(goto)
+        trans: List[Dict[str, int]] = [{} for _ in goto]
+        queue = deque()
+        for child in goto[0].values():
+            trans[child] = dict(goto[child])
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            for ch, child in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = f = goto[f].get(ch, 0)
+                out[child].extend(out[f])
+                trans[child] = {**trans[f], **goto[child]}
+                queue.append(child)
+
+        self._root = goto[0]
+        self._trans = trans
+        self._out = [tuple(o) for o in out]
+        self.states = len(goto)
+
+    def find(self, text: str) -> Set[int]:
+        """Индексы всех ключевых слов, встречающихся в тексте"""
+        root, trans, out = self._root, self._trans, self._out
+        hits = set(out[0])
+        state = 0
+        for ch in text:
+            nxt = trans[state].get(ch)
+            state = root.get(ch, 0) if nxt is None else nxt
+            if out[state]:
+                hits.update(out[state])
+        return hits
+
+    def feed(self, text: str, state: int, hits: Set[int]) -> int:
+        """Продолжение поиска с состояния state (текст по частям, без перекрытия):
+        найденное добавляется в hits, возвращается состояние для следующей части"""
+        root, trans, out = self._root, self._trans, self._out
+        for ch in text:
+            nxt = trans[state].get(ch)
+            state = root.get(ch, 0) if nxt is None else nxt
+            if out[state]:
+                hits.update(out[state])
+        return state
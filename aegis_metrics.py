@@ -0,0 +1,250 @@
+from bisect import bisect_left
+from collections import Counter
+from time import perf_counter
+from typing import Callable, Dict
+import functools
+import os
+import threading
+
+# === ГРАНИЦЫ КОРЗИН ГИСТОГРАММ: 1 мкс * 2^k, до ~17 с ===
+BUCKETS = tuple(1e-6 * 2 ** k for k in range(25))
+
+# Этапы analyze(): (метка этапа, метод анализатора)
+ANALYZER_STAGES = (
+    ('find_triggers', '_find_triggers'),
+    ('combo_bonus', '_calculate_combo_bonus'),
+    ('special_patterns', '_special_patterns'),
+    ('short_boost', '_short_message_boost'),
+    ('format', '_build_result'),
+    ('total', 'analyze'),
+)
+# Операции панели, которые пишут в хранилище
+PANEL_WRITES = ('add_user', 'log_analysis', 'apply_counters', 'delete_user', 'block_user', 'unblock_user')
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами; observe() - один bisect и два сложения"""
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины (как histogram_quantile)"""
+        total = self.count
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                low = BUCKETS[i - 1] if i else 0.0
+                return low + (BUCKETS[i] - low) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class Metrics:
+    """Встроенные метрики горячего пути в формате Prometheus.
+
+    Метрики - семейства с одной меткой: гистограммы, счетчики (Counter по значению метки)
+    и функции, которые вызываются только при экспорте (глубина очередей и т.п.).
+    Инструментирование подменяет методы конкретного объекта обертками с таймером;
+    при enabled=False объекты не трогаются, и стоимость выключенных метрик нулевая.
+    Обновления идут без блокировок: в режиме потоков возможна потеря единичных отсчетов.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._families = {}  # имя -> [тип, описание, метка, {значение метки: Histogram | число | функция}]
+        self._lock = threading.Lock()
+        self._server = None
+        self._writer = None
+        self._stop = threading.Event()
+
+    def _family(self, kind: str, name: str, help: str, label: str) -> Dict:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = [kind, help, label, Counter() if kind == 'counter' else {}]
+            return family[3]
+
+    def histogram(self, name: str, help: str, label: str, value: str) -> Histogram:
+        children = self._family('histogram', name, help, label)
+        return children.setdefault(value, Histogram())
+
+    def counter(self, name: str, help: str, label: str) -> Counter:
+        """Счетчик по значениям метки: вызывающий сам делает counter[value] += n"""
+        return self._family('counter', name, help, label)
+
+    def gauge(self, name: str, help: str, label: str, value: str, fn: Callable[[], float], kind='gauge'):
+        """Значение, которое читается функцией в момент экспорта"""
+        self._family(kind, name, help, label)[value] = fn
+
+    def family(self, name: str) -> Dict:
+        family = self._families.get(name)
+        return dict(family[3]) if family else {}
+
+    # === ИНСТРУМЕНТИРОВАНИЕ ===
+    @staticmethod
+    def timed(fn: Callable, hist: Histogram) -> Callable:
+        observe = hist.observe
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(perf_counter() - start)
+        return wrapper
+
+    def instrument_analyzer(self, analyzer):
+        """Таймеры этапов analyze() и счетчик срабатываний триггеров по категориям"""
+        if not self.enabled:
+            return analyzer
+        for stage, attr in ANALYZER_STAGES:
+            hist = self.histogram('aegis_analyze_stage_seconds', 'Время этапа анализа сообщения', 'stage', stage)
+            setattr(analyzer, attr, self.timed(getattr(analyzer, attr), hist))
+
+        # Срабатывания считаются в _build_result: через него идут analyze, analyze_batch и analyze_bounded
+        hits = self.counter('aegis_trigger_hits_total', 'Срабатывания триггеров по категориям', 'category')
+        build = analyzer._build_result
+        category_of = [None, {}]  # [правила, имя триггера -> категория]: пересчет только при смене правил
+
+        def build_result(names, categories, *args):
+            rules = args[-1]
+            if category_of[0] is not rules:
+                category_of[:] = [rules, {name: category for name, _, category in rules.entries}]
+            for name in names:
+                hits[category_of[1][name]] += 1
+            return build(names, categories, *args)
+        analyzer._build_result = build_result
+        return analyzer
+
+    def instrument_panel(self, panel):
+        """Задержка записи в хранилище по операциям (панель любого типа)"""
+        if not self.enabled:
+            return panel
+        for op in PANEL_WRITES:
+            if hasattr(panel, op):
+                hist = self.histogram('aegis_storage_seconds', 'Задержка записи в хранилище AdminPanel', 'op', op)
+                setattr(panel, op, self.timed(getattr(panel, op), hist))
+        # apply_counters(deferred=True) из WriteBehindPanel.flush возвращает запись снимка, которая идет
+        # уже вне блокировки панели: ее время - отдельная операция snapshot_write
+        if hasattr(panel, 'apply_counters'):
+            apply = panel.apply_counters
+            write_hist = self.histogram('aegis_storage_seconds', 'Задержка записи в хранилище AdminPanel', 'op', 'snapshot_write')
+
+            @functools.wraps(apply)
+            def apply_counters(*args, **kwargs):
+                write = apply(*args, **kwargs)
+                return self.timed(write, write_hist) if write else write
+            panel.apply_counters = apply_counters
+        return panel
+
+    def handler(self, fn):
+        """Обертка async-хендлера: полное время обработки апдейта"""
+        if not self.enabled:
+            return fn
+        observe = self.histogram('aegis_handler_seconds', 'Полное время обработки апдейта хендлером', 'handler', fn.__name__).observe
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                observe(perf_counter() - start)
+        return wrapper
+
+    # === ЭКСПОРТ ===
+    def render(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)"""
+        lines = []
+        with self._lock:
+            families = [(name, kind, help, label, dict(children)) for name, (kind, help, label, children) in self._families.items()]
+        for name, kind, help, label, children in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for value, child in children.items():
+                tag = f'{label}="{_escape(value)}"'
+                if isinstance(child, Histogram):
+                    cumulative = 0
+                    for le, n in zip(BUCKETS, child.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{tag},le="{le:.6g}"}} {cumulative}')
+                    total = cumulative + child.counts[-1]
+                    lines.append(f'{name}_bucket{{{tag},le="+Inf"}} {total}')
+                    lines.append(f'{name}_sum{{{tag}}} {child.sum:.9g}')
+                    lines.append(f'{name}_count{{{tag}}} {total}')
+                else:
+                    lines.append(f'{name}{{{tag}}} {child() if callable(child) else child}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Атомарная запись для textfile collector node_exporter"""
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, addr: str = ''):
+        """HTTP-эндпоинт /metrics в фоновом потоке"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # нужен только с AEGIS_METRICS_PORT
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((addr, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='aegis-metrics-http', daemon=True).start()
+        return self._server
+
+    def start_textfile(self, path: str, interval=15.0):
+        """Периодическая запись файла метрик фоновым потоком"""
+        def run():
+            while not self._stop.wait(interval):
+                self.write_textfile(path)
+        self._stop.clear()
+        self._writer = (threading.Thread(target=run, name='aegis-metrics-file', daemon=True), path)
+        self._writer[0].start()
+
+    def stop(self):
+        self._stop.set()
+        if self._writer:
+            thread, path = self._writer
+            thread.join()
+            self.write_textfile(path)  # финальный снимок
+            self._writer = None
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
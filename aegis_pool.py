@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+import asyncio
+
+
+class PoolBusy(Exception):
+    """Очередь анализа заполнена: запрос отклонен сразу, без ожидания"""
+
+
+# === ПРОЦЕСС-ВОРКЕР: свой анализатор и кэш в каждом процессе ===
+_worker_analyze = None
+
+
+def _init_worker(cache_size: int, near_duplicates: bool, rules: str = None, rules_poll: float = 0, bounded=False, budget=None):
+    global _worker_analyze
+    from aegis_analyzer_v5 import AEGISAnalyzer
+    from aegis_cache import VerdictCache
+    analyzer = AEGISAnalyzer(rules, bounded=bounded, budget=budget)
+    if rules_poll: analyzer.watch(rules_poll)  # каждый процесс сам подхватывает новые правила
+    _worker_analyze = VerdictCache(analyzer, max_size=cache_size, near_duplicates=near_duplicates).analyze if cache_size else analyzer.analyze
+
+
+def _analyze_in_worker(text: str) -> Dict:
+    return _worker_analyze(text)
+
+
+class AnalysisPool:
+    """Вынос анализа из event loop: inline | thread | process.
+
+    Не больше max_inflight анализов одновременно (включая ожидающие в очереди пула):
+    сверх лимита analyze() сразу бросает PoolBusy. Каждый запрос ограничен timeout секунд
+    (asyncio.TimeoutError); слот освобождается только когда задача действительно завершилась.
+    """
+
+    def __init__(self, analyze: Callable[[str], Dict], mode='inline', workers=4, max_inflight=64, timeout=10.0,
+                 cache_size=10000, near_duplicates=False, rules=None, rules_poll=0, bounded=False, budget=None):
+        self.mode = mode
+        self.max_inflight = max_inflight
+        self.timeout = timeout
+        self.inflight = 0
+        self.completed = self.rejected = self.timeouts = 0
+        self._analyze = analyze
+        if mode == 'inline':
+            self.executor = None
+        elif mode == 'thread':
+            self.executor = ThreadPoolExecutor(workers, thread_name_prefix='aegis-analyze')
+        elif mode == 'process':
+            from concurrent.futures import ProcessPoolExecutor  # multiprocessing - только в этом режиме
+            self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cache_size, near_duplicates, rules, rules_poll, bounded, budget))
+            self._analyze = _analyze_in_worker
+        else:
+            raise ValueError(f"Неизвестный режим анализа: {mode}")
+
+    async def analyze(self, text: str) -> Dict:
+        if self.inflight >= self.max_inflight:
+            self.rejected += 1
+            raise PoolBusy()
+        if self.executor is None:
+            self.completed += 1
+            return self._analyze(text)
+
+        loop = asyncio.get_running_loop()
+        self.inflight += 1
+        future = self.executor.submit(self._analyze, text)
+        future.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self._release))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _release(self):
+        self.inflight -= 1
+        self.completed += 1
+
+    def stats(self) -> Dict:
+        return {'mode': self.mode, 'inflight': self.inflight, 'completed': self.completed,
+                'rejected': self.rejected, 'timeouts': self.timeouts}
+
+    def shutdown(self, wait=True):
+        if self.executor: self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
@@ -0,0 +1,163 @@
+from types import MappingProxyType
+from typing import Dict, NamedTuple, Optional, Pattern, Tuple
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+from aegis_matcher import KeywordMatcher
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'aegis_rules.json')
+# Порядок групп = порядок записей (и триггеров в выводе)
+GROUPS = ('critical_triggers', 'social_engineering', 'phishing', 'regional')
+# Меняется при изменении формата скомпилированного артефакта: старые .compiled пересобираются
+COMPILED_FORMAT = 1
+
+
+def _code_version() -> str:
+    """Хэш исходников, из которых собирается артефакт: правка кода правил или автомата
+    сбрасывает кэш, даже если COMPILED_FORMAT забыли поднять"""
+    h = hashlib.sha1(str(COMPILED_FORMAT).encode())
+    for source in (__file__, sys.modules[KeywordMatcher.__module__].__file__):
+        try:
+            with open(source, 'rb') as f: h.update(f.read())
+        except OSError:
+            pass  # исходник недоступен (сборка без .py): остается только COMPILED_FORMAT
+    return h.hexdigest()
+
+
+CODE_VERSION = _code_version()
+
+
+class SpecialPattern(NamedTuple):
+    """Специальный паттерн: регулярка (с префильтром и порогом числа совпадений) или группы слов"""
+    name: str
+    bonus: int
+    regex: Optional[Pattern] = None
+    prefilter: Tuple[str, ...] = ()   # регулярка проверяется, только если есть одна из подстрок
+    min_count: int = 1                # сколько совпадений регулярки нужно
+    words: Tuple[Tuple[str, ...], ...] = ()  # из каждой группы должно встретиться хотя бы одно слово
+
+
+class Ruleset:
+    """Неизменяемый скомпилированный набор правил AEGIS.
+
+    Собирается один раз из данных правил (см. aegis_rules.json): автомат ключевых слов,
+    веса и битовые маски категорий, комбо-маски, скомпилированные регулярки.
+    Анализатор берет ссылку на Ruleset в начале анализа, поэтому подмена правил
+    не затрагивает уже идущие проверки.
+    """
+    __slots__ = ('source', 'version', 'entries', 'matcher', 'keyword_entries', 'entry_weights', 'entry_bits',
+                 'combo_rules', 'combo_masks', 'special', 'threat_type_map')
+
+    def __init__(self, data: Dict):
+        try:
+            self._build(data)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Некорректные правила: {e!r}") from e
+        except re.error as e:
+            raise ValueError(f"Некорректная регулярка в правилах: {e}") from e
+
+    def _build(self, data: Dict):
+        setattr_ = object.__setattr__
+        # Компактный JSON (порядок ключей значим - это порядок триггеров): версия и исходные данные
+        source = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        setattr_(self, 'source', source)
+        setattr_(self, 'version', hashlib.sha1(source.encode('utf-8')).hexdigest())
+
+        # Порядок записей = группа -> категория -> слово
+        entries, keywords = [], []
+        for group in GROUPS:
+            for category, rule in data['groups'][group].items():
+                weight = int(rule['weight'])
+                for keyword in rule['keywords']:
+                    entries.append((f"{category}: {keyword}", weight, category))
+                    keywords.append(keyword.lower())
+        matcher = KeywordMatcher(keywords)
+        keyword_entries = [[] for _ in matcher.keywords]
+        for i, keyword in enumerate(keywords):
+            keyword_entries[matcher.index[keyword]].append(i)
+
+        combo_rules = tuple((frozenset(rule['categories']), int(rule['bonus'])) for rule in data['combo_rules'])
+        categories = sorted({c for _, _, c in entries} | {c for cats, _ in combo_rules for c in cats})
+        bits = {c: 1 << i for i, c in enumerate(categories)}
+
+        special = []
+        for rule in data.get('special_patterns', ()):
+            regex = re.compile(rule['regex']) if 'regex' in rule else None
+            words = tuple(tuple(group) for group in rule.get('words', ()))
+            if (regex is None) == (not words):
+                raise ValueError(f"Паттерн {rule.get('name')!r}: нужен ровно один из regex / words")
+            special.append(SpecialPattern(rule['name'], int(rule['bonus']), regex, tuple(rule.get('prefilter', ())),
+                                          int(rule.get('min_count', 1)), words))
+
+        setattr_(self, 'entries', tuple(entries))
+        setattr_(self, 'matcher', matcher)
+        setattr_(self, 'keyword_entries', tuple(tuple(e) for e in keyword_entries))
+        setattr_(self, 'entry_weights', tuple(w for _, w, _ in entries))
+        setattr_(self, 'entry_bits', tuple(bits[c] for _, _, c in entries))
+        setattr_(self, 'combo_rules', combo_rules)
+        setattr_(self, 'combo_masks', tuple((sum(bits[c] for c in cats), bonus) for cats, bonus in combo_rules))
+        setattr_(self, 'special', tuple(special))
+        setattr_(self, 'threat_type_map', MappingProxyType(dict(data['threat_type_map'])))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Ruleset неизменяем: соберите новый")
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'threat_type_map'}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, 'threat_type_map', MappingProxyType(json.loads(self.source)['threat_type_map']))
+
+    def to_data(self) -> Dict:
+        """Изменяемая копия исходных данных правил"""
+        return json.loads(self.source)
+
+
+def load_ruleset(path: str = DEFAULT_RULES, cache: bool = True) -> Ruleset:
+    """Загрузка правил из JSON-файла.
+
+    Рядом с файлом хранится скомпилированный артефакт (`path + '.compiled'`), привязанный
+    к хэшу содержимого и версии кода: холодный старт с неизменными правилами не пересобирает автомат.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw + CODE_VERSION.encode()).hexdigest()
+    compiled = path + '.compiled'
+    if cache:
+        try:
+            with open(compiled, 'rb') as f:
+                fmt, cached_digest, ruleset = pickle.load(f)
+            if fmt == COMPILED_FORMAT and cached_digest == digest:
+                return ruleset
+        except (OSError, pickle.PickleError, ValueError, EOFError, TypeError, AttributeError):
+            pass  # нет кэша или он от другой версии кода: компилируем заново
+
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from e
+    ruleset = Ruleset(data)
+    if cache:
+        # Свой временный файл у каждого писателя: процессы бота и scan --workers стартуют разом
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(compiled) or '.', prefix=os.path.basename(compiled) + '.',
+                                             suffix='.tmp', delete=False) as f:
+                tmp = f.name
+                pickle.dump((COMPILED_FORMAT, digest, ruleset), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, compiled)
+            tmp = None
+        except OSError:
+            pass  # каталог только для чтения: работаем без кэша
+        finally:
+            if tmp:
+                try: os.unlink(tmp)
+                except OSError: pass
+    return ruleset
@@ -0,0 +1,179 @@
+"""AEGIS bulk scan: потоковая проверка JSONL-выгрузки сообщений.
+
+    python aegis_scan.py export.jsonl -o verdicts.jsonl [--field text] [--id-field id] [--workers 4]
+    cat export.jsonl | python aegis_scan.py - > verdicts.jsonl
+    python aegis_scan.py export.jsonl -o verdicts.jsonl --offset 123456789   # продолжить с байта
+
+Каждая строка вывода: {"offset", "id", "score", "risk_level", "threat_type", "triggers"}
+(с --budget у длинных сообщений еще "early_exit" и "budget_cut", см. AEGISAnalyzer.analyze_bounded).
+Порядок вывода совпадает с порядком ввода; память не зависит от размера файла.
+"""
+from collections import Counter, deque
+from multiprocessing import Pool
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+
+_analyzer = None
+_RELEASE_BYTES = 16 << 20
+
+
+def _init_worker(budget=None):
+    global _analyzer
+    from aegis_analyzer_v5 import AEGISAnalyzer
+    # С бюджетом длинные документы анализируются по частям: ранний выход и не больше budget символов
+    _analyzer = AEGISAnalyzer(bounded=budget is not None, budget=budget or None)
+
+
+def iter_lines(path: str, offset: int = 0):
+    """(байтовое смещение, строка) из файла через mmap или из stdin ('-')"""
+    if path == '-':
+        stream, pos = sys.stdin.buffer, 0
+        while pos < offset:
+            skipped = stream.read(min(1 << 20, offset - pos))
+            if not skipped: return
+            pos += len(skipped)
+        for line in stream:
+            yield pos, line
+            pos += len(line)
+        return
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= offset: return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = offset
+            if pos and mm[pos - 1:pos] != b'\n':  # смещение посреди строки: идем к началу следующей
+                pos = mm.find(b'\n', pos) + 1 or size
+            released = pos - pos % mmap.PAGESIZE
+            while pos < size:
+                end = mm.find(b'\n', pos)
+                end = size if end == -1 else end + 1
+                yield pos, mm[pos:end]
+                pos = end
+                # Прочитанные страницы отдаем ядру, чтобы RSS не рос с размером файла
+                if pos - released >= _RELEASE_BYTES and hasattr(mm, 'madvise'):
+                    upto = pos - pos % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, released, upto - released)
+                    released = upto
+
+
+def iter_chunks(lines, size: int):
+    chunk = []
+    for item in lines:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def scan_chunk(chunk, field: str, id_field: str):
+    """Анализ пачки строк: (JSONL-вывод, уровни риска, смещение после последней строки)"""
+    if _analyzer is None: _init_worker()
+    records, texts = [], []
+    for offset, line in chunk:
+        if not line.strip(): continue
+        try:
+            msg = json.loads(line)
+            text = msg.get(field) if isinstance(msg, dict) else None
+        except ValueError:
+            msg, text = None, None
+        if not isinstance(text, str):
+            records.append({'offset': offset, 'error': 'invalid record'})
+            continue
+        records.append({'offset': offset, 'id': msg.get(id_field)})
+        texts.append(text)
+
+    verdicts = iter(_analyzer.analyze_batch(texts, with_triggers=True))
+    levels = Counter()
+    out = []
+    for record in records:
+        if 'error' not in record:
+            v = next(verdicts)
+            record.update(score=v['score'], risk_level=v['risk_level'], threat_type=v['threat_type'], triggers=v['triggers'])
+            if 'early_exit' in v: record.update(early_exit=v['early_exit'], budget_cut=v['budget_cut'])
+            levels[v['risk_level']] += 1
+        out.append(json.dumps(record, ensure_ascii=False))
+    last_offset, last_line = chunk[-1]
+    return ('\n'.join(out) + '\n' if out else '').encode('utf-8'), levels, last_offset + len(last_line)
+
+
+def scan(path, out, field='text', id_field='id', offset=0, workers=None, chunk_size=500, progress=sys.stderr, budget=None):
+    """Прогон всего файла; возвращает сводку"""
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(iter_lines(path, offset), chunk_size)
+    summary = {'messages': 0, 'levels': Counter(), 'next_offset': offset}
+    start = last_report = time.perf_counter()
+
+    def consume(result):
+        nonlocal last_report
+        data, levels, next_offset = result
+        out.write(data)
+        summary['messages'] += sum(levels.values())
+        summary['levels'].update(levels)
+        summary['next_offset'] = next_offset
+        now = time.perf_counter()
+        if progress and now - last_report >= 1:
+            last_report = now
+            print(f"\r{summary['messages']} msgs  {(next_offset - offset) / 1e6:.1f} MB  "
+                  f"{summary['messages'] / (now - start):.0f} msg/s  offset={next_offset}", end='', file=progress, flush=True)
+
+    if workers == 1:
+        _init_worker(budget)
+        for chunk in chunks:
+            consume(scan_chunk(chunk, field, id_field))
+    else:
+        # Окно из 2*workers пачек: порядок сохраняется, а в памяти не больше окна
+        with Pool(workers, initializer=_init_worker, initargs=(budget,)) as pool:
+            window = deque()
+            for chunk in chunks:
+                window.append(pool.apply_async(scan_chunk, (chunk, field, id_field)))
+                if len(window) >= 2 * workers:
+                    consume(window.popleft().get())
+            while window:
+                consume(window.popleft().get())
+
+    summary['seconds'] = time.perf_counter() - start
+    summary['msg_per_sec'] = summary['messages'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="JSONL-файл или '-' для stdin")
+    parser.add_argument('-o', '--output', default='-', help="файл вердиктов (при --offset дописывается)")
+    parser.add_argument('--field', default='text', help="поле с текстом сообщения")
+    parser.add_argument('--id-field', default='id', help="поле-идентификатор, копируется в вывод")
+    parser.add_argument('--offset', type=int, default=0, help="продолжить с байтового смещения")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--budget', type=int, default=None,
+                        help="анализ по частям с ранним выходом; предел символов на сообщение (0 - без предела)")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.output == '-':
+        out = sys.stdout.buffer
+    else:
+        out = open(args.output, 'ab' if args.offset else 'wb')
+    try:
+        summary = scan(args.input, out, args.field, args.id_field, args.offset, args.workers, args.chunk_size,
+                       progress=None if args.quiet else sys.stderr, budget=args.budget)
+    finally:
+        out.flush()
+        if out is not sys.stdout.buffer: out.close()
+
+    if not args.quiet:
+        levels = ' '.join(f"{k}={v}" for k, v in sorted(summary['levels'].items()))
+        print(f"\n✅ {summary['messages']} сообщений за {summary['seconds']:.1f} с ({summary['msg_per_sec']:.0f} msg/s)\n"
+              f"📊 {levels}\n⏩ продолжить: --offset {summary['next_offset']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+from typing import Any, Awaitable, Callable
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+
+
+def partition(uid: int, workers: int) -> int:
+    """Номер процесса для пользователя: все апдейты одного uid попадают в один процесс"""
+    return uid % workers
+
+
+def _worker_entry(target: Callable, index: int, queue, args: tuple):
+    # Ctrl+C и SIGTERM приходят всей группе процессов: останавливает воркеры только главный процесс,
+    # прислав маркер конца после уже принятых апдейтов
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    target(index, queue, *args)
+
+
+class WorkerGroup:
+    """N процессов-обработчиков, апдейты разбиваются по uid.
+
+    Главный процесс только принимает апдейты и раскладывает (uid, payload) по очередям
+    процессов; у каждого процесса свой анализатор, кэш и флуд-контроль, а общее состояние
+    (пользователи, счетчики, блокировки) живет в общей SQLite-базе. Процессы запускаются
+    через spawn: ничего из памяти главного процесса (соединения, потоки) не наследуется.
+
+    В очередь процесса пишет только его задача-перекладчик: dispatch кладет апдейт в
+    asyncio-очередь перед ней, поэтому при полной очереди процесса порядок не меняется.
+    Если процесс умер, его апдейты отбрасываются (счетчик dropped) - dispatch и остановка не зависают.
+    """
+
+    def __init__(self, workers: int, target: Callable, args: tuple = (), queue_size: int = 1000, put_timeout: float = 1.0):
+        ctx = multiprocessing.get_context('spawn')
+        self.workers = workers
+        self.queues = [ctx.Queue(queue_size) for _ in range(workers)]
+        self.processes = [ctx.Process(target=_worker_entry, args=(target, i, q, args), name=f'aegis-worker-{i}')
+                          for i, q in enumerate(self.queues)]
+        self.dispatched = [0] * workers
+        self.dropped = [0] * workers  # апдейты, не доставленные в умерший процесс
+        self.queue_size = queue_size
+        self.put_timeout = put_timeout
+        self._pending = self._slots = None  # asyncio-очереди перед очередями процессов: создаются в event loop при первом dispatch
+        self._feeders = []
+
+    def start(self):
+        for p in self.processes:
+            p.start()
+
+    async def dispatch(self, uid: int, payload: Any):
+        """Отправка апдейта в процесс пользователя; когда заполнены обе очереди, ждем, не блокируя event loop"""
+        if self._pending is None:
+            self._pending = [asyncio.Queue() for _ in range(self.workers)]
+            self._slots = [asyncio.Semaphore(self.queue_size) for _ in range(self.workers)]
+            self._feeders = [asyncio.create_task(self._feed(i)) for i in range(self.workers)]
+        i = partition(uid, self.workers)
+        # Кладем сразу (порядок в очереди = порядок вызовов), а ждем уже после: ожидающий
+        # put ограниченной asyncio.Queue может обогнать только что пришедший вызов
+        self._pending[i].put_nowait((uid, payload))
+        self.dispatched[i] += 1
+        await self._slots[i].acquire()
+
+    async def _feed(self, i: int):
+        """Единственный писатель в очередь процесса i: апдейты уходят строго в порядке dispatch"""
+        loop = asyncio.get_running_loop()
+        pending, queue = self._pending[i], self.queues[i]
+        while True:
+            item = await pending.get()
+            if not self.processes[i].is_alive():
+                self._drop(i)
+            else:
+                try:
+                    queue.put_nowait(item)
+                except queue_module.Full:
+                    if not await loop.run_in_executor(None, self._put, i, item): self._drop(i)
+            self._slots[i].release()
+            pending.task_done()
+
+    def _put(self, i: int, item) -> bool:
+        """Блокирующая запись в очередь процесса i (в потоке); False - процесс умер, очередь никто не читает"""
+        while self.processes[i].is_alive():
+            try:
+                self.queues[i].put(item, timeout=self.put_timeout)
+                return True
+            except queue_module.Full:
+                pass
+        return False
+
+    def _drop(self, i: int):
+        if not self.dropped[i]:
+            logging.error("AEGIS: процесс-обработчик %d завершился (код %s), его апдейты отбрасываются",
+                          i, self.processes[i].exitcode)
+        self.dropped[i] += 1
+
+    async def drain(self):
+        """Дождаться, пока все принятые апдейты лягут в очереди процессов (перед stop)"""
+        if self._pending is None: return
+        for p in self._pending:
+            await p.join()
+        for f in self._feeders:
+            f.cancel()
+        self._pending = self._slots = None
+        self._feeders = []
+
+    def stop(self, timeout: float = 30.0):
+        """Маркер конца в каждую очередь и ожидание: процессы дорабатывают принятые апдейты (сначала drain)"""
+        for i in range(self.workers):
+            self._put(i, None)
+        for p in self.processes:
+            p.join(timeout)
+            if p.is_alive(): p.terminate()
+
+
+async def consume(queue, handle: Callable[[Any], Awaitable], concurrency: int = 64):
+    """Цикл процесса-обработчика: (uid, payload) из очереди до маркера None.
+
+    Апдейты разных пользователей идут параллельно (не больше concurrency), апдейты одного
+    пользователя - строго по очереди, в порядке поступления.
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    tails = {}  # uid -> задача последнего апдейта пользователя
+
+    async def run(uid, payload, prev):
+        try:
+            if prev is not None:
+                await asyncio.wait([prev])
+            await handle(payload)
+        except Exception:
+            logging.exception("AEGIS: ошибка обработки апдейта пользователя %s", uid)
+        finally:
+            slots.release()
+            if tails.get(uid) is asyncio.current_task(): del tails[uid]
+
+    while True:
+        # Блокирующее ожидание - в потоке, дальше забираем все, что уже лежит в очереди
+        items = [await loop.run_in_executor(None, queue.get)]
+        while items[-1] is not None:
+            try: items.append(queue.get_nowait())
+            except queue_module.Empty: break
+        for item in items:
+            if item is None: break
+            uid, payload = item
+            await slots.acquire()
+            tails[uid] = loop.create_task(run(uid, payload, tails.get(uid)))
+        if items[-1] is None: break
+    if tails:
+        await asyncio.wait(list(tails.values()))
@@ -0,0 +1,38 @@
+"""Сверка и бенчмарк пакетного анализа.
+
+    python -m benchmarks.bench_batch [--messages 10000]
+"""
+import argparse
+import sys
+import time
+
+from aegis_analyzer_v5 import AEGISAnalyzer
+from benchmarks.corpus import make_corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    analyzer = AEGISAnalyzer()
+    corpus = make_corpus(args.messages, seed=args.seed)
+
+    start = time.perf_counter()
+    single = [analyzer.analyze(t) for t in corpus]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = analyzer.analyze_batch(corpus)
+    batch_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(single, batch) if a != b)
+    print(f"parity: {len(corpus) - mismatches}/{len(corpus)} совпадений")
+    print(f"analyze() loop: {len(corpus) / loop_time:>10.0f} msg/s")
+    print(f"analyze_batch:  {len(corpus) / batch_time:>10.0f} msg/s ({loop_time / batch_time:.1f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
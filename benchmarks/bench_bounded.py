@@ -0,0 +1,103 @@
+"""Анализ по частям (analyze_bounded) против полного analyze(): паритет вердиктов и выигрыш.
+
+    python -m benchmarks.bench_bounded [--messages 3000] [--docs 200] [--budget 8192]
+
+Корпус: длинные сообщения до лимита Telegram, "вставленные документы" на 10-100 тыс. символов
+и текст без пробелов, где части режутся посреди токена (числа нарочно лежат на границах частей).
+Без обрыва (нет раннего выхода и бюджета) вердикт обязан совпасть с analyze() целиком;
+при раннем выходе - score и уровень риска. Код возврата 1, если паритет нарушен.
+"""
+import argparse
+import random
+import string
+import sys
+import time
+
+from aegis_analyzer_v5 import CHUNK_SIZE, AEGISAnalyzer
+from benchmarks.corpus import FILLER, make_corpus, make_message
+
+EXTRA = ('early_exit', 'budget_cut')
+
+
+def make_docs(n: int, seed: int):
+    """Длинные документы: от чистой "простыни" до сплошной рассылки"""
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n):
+        size, scam = rng.randint(10000, 100000), rng.choice([None, 0.0, 0.4])  # None - только "простыня"
+        parts, total = [], 0
+        while total < size:
+            part = make_message(rng, scam_ratio=scam, long_ratio=0.0) if scam is not None and rng.random() < 0.3 else rng.choice(FILLER)
+            parts.append(part)
+            total += len(part) + 1
+        docs.append(' '.join(parts))
+    return docs
+
+
+def make_unspaced(n: int, seed: int):
+    """Текст без пробелов вроде вставленного лога или base64: латинские токены через -_./
+    и числа из 10-20 цифр поперек границ частей (16 цифр - спецпаттерн карты)"""
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n):
+        size, parts, total = rng.randint(2000, 20000), [], 0
+        while total < size:
+            parts.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12))) + rng.choice('-_./'))
+            total += len(parts[-1])
+        text = ''.join(parts)
+        for boundary in range(CHUNK_SIZE, len(text), CHUNK_SIZE):
+            digits = '-' + ''.join(rng.choice(string.digits) for _ in range(rng.randint(10, 20))) + '-'
+            at = boundary - rng.randint(1, len(digits) - 1)
+            text = text[:at] + digits + text[at + len(digits):]
+        docs.append(text)
+    return docs
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    results = [fn(t) for t in texts]
+    return results, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=3000)
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--budget', type=int, default=8192)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    analyzer = AEGISAnalyzer()
+    corpora = {
+        'short': make_corpus(args.messages, seed=args.seed, long_ratio=0.0),
+        'telegram': make_corpus(args.messages, seed=args.seed, long_ratio=1.0),
+        'documents': make_docs(args.docs, args.seed),
+        'unspaced': make_unspaced(args.docs, args.seed),
+    }
+    failures = 0
+    print(f"{'corpus':>10} {'mode':>8} {'msgs':>6} {'full ms':>9} {'bounded ms':>11} {'gain':>6} "
+          f"{'early':>6} {'cut':>5} {'same verdict':>13} {'same card':>10}")
+    for name, texts in corpora.items():
+        full, full_time = timed(analyzer.analyze, texts)
+        for mode, budget in (('exact', None), ('budget', args.budget)):
+            bounded, bounded_time = timed(lambda t: analyzer.analyze_bounded(t, budget), texts)
+            early = sum(r['early_exit'] for r in bounded)
+            cut = sum(r['budget_cut'] for r in bounded)
+            same_verdict = same_card = 0
+            for a, b in zip(full, bounded):
+                verdict = (a['score'], a['risk_level']) == (b['score'], b['risk_level'])
+                card = a == {k: v for k, v in b.items() if k not in EXTRA}
+                same_verdict += verdict
+                same_card += card
+                # Паритет: без обрыва - вся карточка, при раннем выходе - score и уровень
+                if not b['budget_cut'] and not (card if not b['early_exit'] else verdict):
+                    failures += 1
+            print(f"{name:>10} {mode:>8} {len(texts):>6} {full_time * 1000 / len(texts):>9.3f} "
+                  f"{bounded_time * 1000 / len(texts):>11.3f} {full_time / bounded_time:>5.1f}x {early:>6} {cut:>5} "
+                  f"{same_verdict / len(texts):>13.2%} {same_card / len(texts):>10.2%}")
+    print(f"\n{'OK' if not failures else 'FAIL'}: {failures} нарушений паритета")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
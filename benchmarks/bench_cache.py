@@ -0,0 +1,48 @@
+"""Кэш вердиктов на корпусе с волнами рассылок: hit rate и выигрыш по скорости.
+
+    python -m benchmarks.bench_cache [--messages 20000] [--campaigns 20]
+"""
+import argparse
+import sys
+import time
+
+from aegis_analyzer_v5 import AEGISAnalyzer
+from aegis_cache import VerdictCache
+from benchmarks.corpus import make_campaign_corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--campaigns', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    analyzer = AEGISAnalyzer()
+    corpus = make_campaign_corpus(args.messages, seed=args.seed, campaigns=args.campaigns)
+
+    start = time.perf_counter()
+    truth = [analyzer.analyze(t) for t in corpus]
+    base = len(corpus) / (time.perf_counter() - start)
+    print(f"{'mode':>12} {'msg/s':>9} {'gain':>6} {'hit rate':>9} {'near hits':>10} {'same verdict':>13}")
+    print(f"{'no cache':>12} {base:>9.0f} {1.0:>5.1f}x {'-':>9} {'-':>10} {'100.00%':>13}")
+
+    for mode, near in (('exact', False), ('near-dup', True)):
+        cache = VerdictCache(analyzer, near_duplicates=near)
+        start = time.perf_counter()
+        verdicts = [cache.analyze(t) for t in corpus]
+        rate = len(corpus) / (time.perf_counter() - start)
+        same = sum(1 for a, b in zip(verdicts, truth) if (a['score'], a['risk_level']) == (b['score'], b['risk_level']))
+        s = cache.stats()
+        print(f"{mode:>12} {rate:>9.0f} {rate / base:>5.1f}x {s['hit_rate']:>9.2%} {s['near_hits']:>10} {same / len(corpus):>13.2%}")
+
+    # Смена правил сбрасывает кэш
+    analyzer.regional['messaging_apps']['keywords'].append('signal')
+    analyzer._compile()
+    cache.analyze(corpus[0])
+    print(f"invalidations after rule change: {cache.stats()['invalidations']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Флуд-контроль: стоимость проверки, ограниченность памяти и защита анализатора от флудера.
+
+    python -m benchmarks.bench_flood [--senders 1000000] [--seconds 60]
+
+1) check() на потоке из --senders уникальных отправителей и на горячем наборе: нс на проверку
+   и размер таблицы (не должен превышать max_users).
+2) Сценарий на модельных часах: флудер шлет 20 длинных текстов в секунду, 200 обычных
+   пользователей - сообщение раз в 10 с. Сравнивается время анализатора без лимита и с ним.
+"""
+import argparse
+import random
+import sys
+import time
+
+from aegis_analyzer_v5 import AEGISAnalyzer
+from aegis_flood import FloodControl
+from benchmarks.corpus import make_corpus
+
+
+class Clock:
+    def __init__(self): self.now = 0.0
+
+    def __call__(self): return self.now
+
+
+def bench_check(senders: int, max_users: int):
+    print(f"{'stream':>14} {'checks':>9} {'ns/check':>9} {'table':>8} {'evicted':>9}")
+    for name, uids in (('unique', range(senders)), ('hot 1000', [i % 1000 for i in range(senders)])):
+        clock = Clock()
+        flood = FloodControl(max_users=max_users, clock=clock)
+        start = time.perf_counter()
+        for i, uid in enumerate(uids):
+            clock.now = i * 1e-4  # 10k сообщений в секунду
+            flood.check(uid, 200)
+        ns = (time.perf_counter() - start) * 1e9 / senders
+        assert len(flood) <= max_users
+        print(f"{name:>14} {senders:>9} {ns:>9.0f} {len(flood):>8} {flood.evictions:>9}")
+    return ns
+
+
+def bench_scenario(seconds: int, seed: int):
+    rng = random.Random(seed)
+    analyzer = AEGISAnalyzer()
+    normal = make_corpus(500, seed=seed, long_ratio=0.0)
+    spam = 'СРОЧНО! Ваша карта заблокирована, переведите деньги на безопасный счет ' * 55  # ~4000 символов
+    events = [(t / 20, 0, spam) for t in range(seconds * 20)]
+    events += [(rng.uniform(0, seconds), uid, rng.choice(normal)) for uid in range(1, 201) for _ in range(seconds // 10)]
+    events.sort(key=lambda e: e[0])
+
+    print(f"\n{'mode':>10} {'analyzed':>9} {'flooder':>8} {'normal':>7} {'analyzer s':>11} {'check us':>9}")
+    for mode in ('no limit', 'limit'):
+        clock = Clock()
+        flood = FloodControl(block_after=0, clock=clock) if mode == 'limit' else None
+        counts, busy, checks = [0, 0], 0.0, 0.0
+        for ts, uid, text in events:
+            clock.now = ts
+            if flood is not None:
+                start = time.perf_counter()
+                limited = flood.check(uid, len(text))
+                checks += time.perf_counter() - start
+                if limited: continue
+            start = time.perf_counter()
+            analyzer.analyze(text)
+            busy += time.perf_counter() - start
+            counts[uid != 0] += 1
+        print(f"{mode:>10} {sum(counts):>9} {counts[0]:>8} {counts[1]:>7} {busy:>11.2f} {checks * 1e6 / len(events):>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--senders', type=int, default=1000000)
+    parser.add_argument('--max-users', type=int, default=100000)
+    parser.add_argument('--seconds', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    bench_check(args.senders, args.max_users)
+    bench_scenario(args.seconds, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Восстановление journal-хранилища после падения: сверка состояния и скорость реплея.
+
+    python -m benchmarks.bench_journal_recovery [--events 20000] [--users 2000]
+
+1) Оборванная последняя запись журнала: после перезапуска состояние равно состоянию до
+   обрыва, хвост отрезан, новые события дописываются и переживают еще один перезапуск.
+2) Падение между os.replace снимка и очисткой журнала: события с seq из снимка
+   пропускаются, ничего не учитывается дважды.
+Код возврата 1, если состояние после восстановления разошлось с эталоном.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from admin_panel import JournaledAdminPanel
+
+
+def state(panel) -> str:
+    """Состояние панели в сравнимом виде (как в снимке)"""
+    return json.dumps({**panel._snapshot(), 'seq': panel.seq}, sort_keys=True, default=str)
+
+
+def fill(panel, events: int, users: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(events):
+        uid, r = 100000000 + rng.randrange(users), rng.random()
+        if r < 0.3: panel.add_user(uid, f'user{uid}', 'Тест')
+        elif r < 0.95: panel.log_analysis(uid, rng.randrange(100))
+        elif r < 0.98: panel.block_user(uid, 'bench')
+        else: panel.unblock_user(uid)
+
+
+def check_torn_tail(tmp, args):
+    db = os.path.join(tmp, 'torn.json')
+    panel = JournaledAdminPanel(db, compact_every=10 ** 9)
+    fill(panel, args.events, args.users, args.seed)
+    expected, size = state(panel), os.path.getsize(panel.journal)
+    panel.close()
+    with open(panel.journal, 'ab') as f:
+        f.write(b'[%d,"log_analysis",["100000001",9' % (panel.seq + 1))  # запись оборвана на середине
+
+    start = time.perf_counter()
+    panel = JournaledAdminPanel(db, compact_every=10 ** 9)
+    replay = time.perf_counter() - start
+    ok = state(panel) == expected and os.path.getsize(panel.journal) == size
+    panel.log_analysis(100000001, 90)
+    after = state(panel)
+    panel.close()
+    panel = JournaledAdminPanel(db, compact_every=10 ** 9)
+    ok = ok and state(panel) == after
+    panel.close()
+    return ok, replay
+
+
+def check_snapshot_without_truncate(tmp, args):
+    db = os.path.join(tmp, 'replaced.json')
+    panel = JournaledAdminPanel(db, compact_every=10 ** 9)
+    fill(panel, args.events, args.users, args.seed)
+    expected = state(panel)
+    shutil.copyfile(panel.journal, panel.journal + '.copy')
+    panel.save()  # снимок заменен и журнал очищен...
+    panel.close()
+    os.replace(panel.journal + '.copy', panel.journal)  # ...но очистка журнала "не успела" до падения
+
+    start = time.perf_counter()
+    panel = JournaledAdminPanel(db, compact_every=10 ** 9)
+    replay = time.perf_counter() - start
+    ok = state(panel) == expected
+    panel.close()
+    return ok, replay
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    failures = 0
+    print(f"{'scenario':>28} {'events':>7} {'reopen ms':>10} {'state':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, check in (('torn trailing record', check_torn_tail),
+                            ('snapshot replaced, no trunc', check_snapshot_without_truncate)):
+            ok, replay = check(tmp, args)
+            failures += not ok
+            print(f"{name:>28} {args.events:>7} {replay * 1000:>10.1f} {'OK' if ok else 'FAIL':>6}")
+    print(f"\n{'OK' if not failures else 'FAIL'}: {failures} расхождений после восстановления")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
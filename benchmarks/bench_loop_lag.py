@@ -0,0 +1,94 @@
+"""Задержка event loop при всплеске апдейтов: прямая запись статистики против WriteBehindPanel.
+
+    python -m benchmarks.bench_loop_lag [--users 5000] [--updates 300] [--rate 1000] [--storage json]
+        [--modes direct,write-behind]
+
+На большой базе прямой режим переписывает снимок на каждый апдейт: там имеет смысл
+--modes write-behind и --updates побольше, чтобы в прогон попали фоновые сбросы (interval 0.5 с).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from admin_panel import WriteBehindPanel, open_admin_panel
+from admin_sqlite import migrate_json
+from aegis_analyzer_v5 import AEGISAnalyzer
+from benchmarks.bench_storage import make_db
+from benchmarks.corpus import make_corpus
+
+
+async def monitor(lags, stop, tick=0.001):
+    """Насколько позже запланированного просыпается короткий sleep"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append((time.perf_counter() - start - tick) * 1000)
+
+
+async def handle(admin, analyzer, uid, text):
+    """Повторяет путь bot_v5.analyze без сети"""
+    if admin.is_blocked(uid): return
+    admin.add_user(uid, f'user{uid}', 'Имя')
+    res = analyzer.analyze(text)
+    admin.log_analysis(uid, res['score'])
+    await asyncio.sleep(0)  # reply_html
+
+
+async def burst(admin, analyzer, corpus, users, rate):
+    """Апдейты приходят с частотой rate в секунду, каждый обрабатывается своей задачей"""
+    lags, stop = [], asyncio.Event()
+    mon = asyncio.create_task(monitor(lags, stop))
+    start = time.perf_counter()
+    tasks = []
+    for i, text in enumerate(corpus):
+        tasks.append(asyncio.create_task(handle(admin, analyzer, 100000000 + (i * 7919) % users, text)))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await mon
+    return elapsed, lags
+
+
+def run(panel, analyzer, corpus, users, rate):
+    if isinstance(panel, WriteBehindPanel): panel.start()
+    elapsed, lags = asyncio.run(burst(panel, analyzer, corpus, users, rate))
+    panel.close()
+    lags.sort()
+    return elapsed, lags
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--updates', type=int, default=300)
+    parser.add_argument('--rate', type=float, default=1000, help='апдейтов в секунду')
+    parser.add_argument('--storage', default='json', choices=('json', 'journal', 'sqlite'))
+    parser.add_argument('--modes', default='direct,write-behind')
+    args = parser.parse_args(argv)
+
+    analyzer = AEGISAnalyzer()
+    corpus = make_corpus(args.updates)
+    print(f"{'mode':>12} {'updates/s':>10} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(','):
+            db = os.path.join(tmp, f'{mode}.json')
+            make_db(db, args.users)
+            if args.storage == 'sqlite':
+                migrate_json(db, db + '.db')
+                db += '.db'
+            panel = open_admin_panel(args.storage, db)
+            if mode == 'write-behind':
+                panel = WriteBehindPanel(panel, interval=0.5)
+            elapsed, lags = run(panel, analyzer, corpus, args.users, args.rate)
+            p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+            print(f"{mode:>12} {len(corpus) / elapsed:>10.0f} {statistics.median(lags or [0]):>11.2f} {p99:>11.2f} {max(lags or [0]):>11.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
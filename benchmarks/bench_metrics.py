@@ -0,0 +1,68 @@
+"""Накладные расходы метрик на analyze(): выключены / включены, с порогом.
+
+    python -m benchmarks.bench_metrics [--messages 5000] [--max-overhead 0.15]
+
+Код возврата 1, если включенные метрики замедляют анализ больше чем на max-overhead
+или выключенные - больше чем на 2% (выключенные не должны менять анализатор вообще).
+"""
+import argparse
+import sys
+import time
+
+from aegis_analyzer_v5 import AEGISAnalyzer
+from aegis_metrics import Metrics
+from benchmarks.corpus import make_corpus
+
+
+def best_rate(analyzer, corpus, repeats):
+    best = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in corpus:
+            analyzer.analyze(text)
+        best = max(best, len(corpus) / (time.perf_counter() - start))
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--max-overhead', type=float, default=0.15)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.messages, seed=args.seed)
+    plain = AEGISAnalyzer()
+    disabled = Metrics(enabled=False).instrument_analyzer(AEGISAnalyzer())
+    metrics = Metrics()
+    enabled = metrics.instrument_analyzer(AEGISAnalyzer())
+
+    for a, b in ((plain, disabled), (plain, enabled)):
+        assert all(a.analyze(t) == b.analyze(t) for t in corpus[:500]), "метрики изменили вердикт"
+
+    # Чередуем прогоны, чтобы дрейф частоты CPU не попадал в разницу
+    base = off = on = 0.0
+    for _ in range(args.repeats):
+        base = max(base, best_rate(plain, corpus, 1))
+        off = max(off, best_rate(disabled, corpus, 1))
+        on = max(on, best_rate(enabled, corpus, 1))
+
+    print(f"{'mode':>10} {'msg/s':>9} {'overhead':>9}")
+    print(f"{'plain':>10} {base:>9.0f} {'-':>9}")
+    print(f"{'disabled':>10} {off:>9.0f} {1 - off / base:>9.1%}")
+    print(f"{'enabled':>10} {on:>9.0f} {1 - on / base:>9.1%}")
+
+    stages = metrics.family('aegis_analyze_stage_seconds')
+    print(f"\n{'stage':>18} {'count':>8} {'p50 us':>8} {'p99 us':>8} {'share':>7}")
+    total = stages['total'].sum
+    for stage, h in stages.items():
+        print(f"{stage:>18} {h.count:>8} {h.quantile(0.5) * 1e6:>8.1f} {h.quantile(0.99) * 1e6:>8.1f} {h.sum / total:>7.1%}")
+
+    ok = 1 - on / base <= args.max_overhead and 1 - off / base <= 0.02
+    print(f"\n{'OK' if ok else 'FAIL'}: overhead limit {args.max_overhead:.0%}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Нагрузочный тест хендлера анализа: задержка ответа p50/p99 для коротких и очень длинных сообщений.
+
+    python -m benchmarks.bench_pool [--updates 2000] [--rate 2000] [--long-ratio 0.05] [--long-chars 4096]
+
+Если установлены telegram и dotenv, гоняется сам bot_v5.analyze с поддельными Update;
+иначе - тот же путь через AnalysisPool без bot_v5.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+
+from aegis_analyzer_v5 import AEGISAnalyzer
+from aegis_pool import AnalysisPool, PoolBusy
+from benchmarks.corpus import FILLER, make_corpus
+from benchmarks.fakes import load_bot, message_update
+
+
+def make_updates(n, long_ratio, long_chars, seed=7):
+    rng = random.Random(seed)
+    short = make_corpus(n, seed=seed, long_ratio=0)
+    updates = []
+    for i, text in enumerate(short):
+        if rng.random() < long_ratio:
+            parts = [text]
+            while sum(len(p) + 1 for p in parts) < long_chars:
+                parts.append(rng.choice(FILLER))
+            text = ' '.join(parts)[:long_chars]
+        updates.append((100000000 + i % 500, text))
+    return updates
+
+
+async def pool_handler(pool, update):
+    """Путь bot_v5.analyze без telegram: пул + ответ"""
+    try: res = await pool.analyze(update.message.text)
+    except PoolBusy: await update.message.reply_text("busy"); return
+    except asyncio.TimeoutError: await update.message.reply_text("timeout"); return
+    await update.message.reply_html(f"{res['score']}")
+
+
+async def drive(handler, updates, rate):
+    """Апдейты по расписанию: задержка считается от запланированного прихода,
+    поэтому занятый event loop не прячет очередь (coordinated omission)"""
+    sent, tasks = [], []
+    start = time.perf_counter()
+    for i, (uid, text) in enumerate(updates):
+        due = start + i / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        update = message_update(uid, text)
+        update.message.created = due
+        sent.append(update)
+        tasks.append(asyncio.create_task(handler(update)))
+    await asyncio.gather(*tasks)
+    return sent
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else float('nan')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=500)
+    parser.add_argument('--long-ratio', type=float, default=0.05)
+    parser.add_argument('--long-chars', type=int, default=4096)
+    parser.add_argument('--modes', default='inline,thread,process')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-inflight', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    updates = make_updates(args.updates, args.long_ratio, args.long_chars)
+    tmp = tempfile.mkdtemp()
+    try:
+        bot = load_bot(tmp, AEGIS_STORAGE='sqlite')
+    except ImportError as e:
+        bot = None
+        print(f"bot_v5 недоступен ({e}), гоняем AnalysisPool напрямую")
+
+    print(f"{'mode':>8} {'short p50':>10} {'short p99':>10} {'long p50':>9} {'long p99':>9} {'busy':>5} {'upd/s':>7}")
+    for mode in args.modes.split(','):
+        # Кэш выключен: меряем сам анализ, а не попадания
+        pool = AnalysisPool(AEGISAnalyzer().analyze, mode=mode, workers=args.workers,
+                            max_inflight=args.max_inflight, cache_size=0)
+        if bot:
+            bot.pool = pool
+            handler = lambda u: bot.analyze(u, None)
+        else:
+            handler = lambda u: pool_handler(pool, u)
+        start = time.perf_counter()
+        sent = asyncio.run(drive(handler, updates, args.rate))
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+
+        short = [u.message.replies[0][0] for u in sent if len(u.message.text) < 1000 and u.message.replies]
+        long = [u.message.replies[0][0] for u in sent if len(u.message.text) >= 1000 and u.message.replies]
+        print(f"{mode:>8} {percentile(short, .5):>8.2f}ms {percentile(short, .99):>8.2f}ms {percentile(long, .5):>7.2f}ms "
+              f"{percentile(long, .99):>7.2f}ms {pool.rejected:>5} {len(sent) / elapsed:>7.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Холодный старт бота: время от запуска процесса до ответа на первый апдейт.
+
+    python -m benchmarks.bench_startup [--users 1000000] [--runs 5] [--latency 0.05] [--before /path/to/old/checkout]
+
+bot_v5.py запускается отдельным процессом против поддельного Bot API (benchmarks.fake_bot_api):
+в очереди getUpdates уже лежит одно сообщение, в рабочем каталоге - снимок на --users
+пользователей, каждый вызов Bot API отвечает через --latency секунд (RTT до Telegram).
+Снимок пишет код той же версии, что и запускаемый бот: со --before сравниваются две версии
+(например, `git worktree add /tmp/before HEAD~1`). Хранилище - AEGIS_STORAGE из окружения.
+Нужны telegram и dotenv.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_bot_api import TOKEN, FakeBotAPI, make_update
+from benchmarks.fakes import ROOT
+
+CHAT_ID = 1000000001
+SNAPSHOT_SCRIPT = """
+import sys
+from admin_panel import AdminPanel
+from benchmarks.bench_users_memory import build_table, make_users
+panel = AdminPanel(sys.argv[1])
+panel.users = build_table(list(make_users(int(sys.argv[2]))))
+panel.save()
+"""
+
+
+def make_snapshot(root: str, users: int) -> bytes:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'aegis_users.json')
+        subprocess.run([sys.executable, '-c', SNAPSHOT_SCRIPT, path, str(users)], cwd=root, check=True)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+async def start_once(root: str, workdir: str, env: dict, latency: float, timeout: float, verbose: bool):
+    """(первый getUpdates, ответ на первый апдейт) в секундах от запуска процесса или None"""
+    api = FakeBotAPI(latency=latency)
+    await api.start()
+    api.push_update(make_update(1, CHAT_ID, 'Ваша карта заблокирована, срочно переведите деньги на безопасный счет'))
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(root, 'bot_v5.py')], cwd=workdir,
+                            env={**env, 'AEGIS_BOT_API_URL': api.base_url},
+                            stdout=subprocess.DEVNULL, stderr=None if verbose else subprocess.DEVNULL)
+    try:
+        polling = None
+        while CHAT_ID not in api.replies:
+            if polling is None and api.calls['getUpdates']:
+                polling = time.perf_counter() - start
+            if proc.poll() is not None or time.perf_counter() - start > timeout:
+                return None
+            await asyncio.sleep(0.002)
+        return polling or api.replies[CHAT_ID] - start, api.replies[CHAT_ID] - start
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, proc.wait, timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        await api.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000000, help="пользователей в снимке (0 - пустая база)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка ответа Bot API, с")
+    parser.add_argument('--before', help="каталог с другой версией бота для сравнения")
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('-v', '--verbose', action='store_true', help="показывать stderr бота")
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, 'TELEGRAM_BOT_TOKEN': TOKEN, 'AEGIS_RULES_POLL': '0', 'AEGIS_MODE': 'polling'}
+    versions = ([('before', args.before)] if args.before else []) + [('current', ROOT)]
+    print(f"users: {args.users}, storage: {env.get('AEGIS_STORAGE', 'json')}, Bot API latency: {args.latency * 1000:.0f} ms")
+    print(f"{'version':>8} {'polling ms':>11} {'first reply ms':>15} {'min ms':>8} {'max ms':>8}")
+    failures = 0
+    for name, root in versions:
+        snapshot = make_snapshot(root, args.users)
+        polls, firsts = [], []
+        for _ in range(args.runs):
+            # Каждый прогон - с исходного снимка и без журнала: первый апдейт дописывает пользователя
+            with tempfile.TemporaryDirectory() as workdir:
+                with open(os.path.join(workdir, 'aegis_users.json'), 'wb') as f:
+                    f.write(snapshot)
+                result = asyncio.run(start_once(root, workdir, env, args.latency, args.timeout, args.verbose))
+            if result is None:
+                print(f"❌ {name}: нет ответа на первый апдейт (запустите с --verbose)", file=sys.stderr)
+                failures += 1
+                continue
+            polls.append(result[0])
+            firsts.append(result[1])
+        if firsts:
+            print(f"{name:>8} {statistics.median(polls) * 1000:>11.0f} {statistics.median(firsts) * 1000:>15.0f} "
+                  f"{min(firsts) * 1000:>8.0f} {max(firsts) * 1000:>8.0f}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Задержка одного события и экранов админки AdminPanel в зависимости от числа пользователей.
+
+    python -m benchmarks.bench_storage [--sizes 1000,100000,1000000] [--storages json,journal,sqlite]
+
+Перед замером - проверка пачки счетчиков, где у одного uid строки в нескольких корзинах риска:
+рейтинг риска должен совпасть с тем же набором строк, примененным по одной.
+Код возврата 1, если не совпал.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from admin_index import risk_bucket
+from admin_panel import open_admin_panel
+from admin_sqlite import migrate_json
+
+
+def make_db(path: str, users: int):
+    """Снимок базы с `users` пользователями в формате aegis_users.json"""
+    d = {'users': {}, 'stats': {'analyzes': 0, 'threats': 0}, 'blocked_users': {}}
+    for i in range(users):
+        uid = str(100000000 + i)
+        d['users'][uid] = {'user_id': uid, 'username': f'user{i}', 'name': f'Имя {i}', 'joined': '2025-01-01 12:00:00.000000', 'analyzes': i % 50}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(d, f, ensure_ascii=False)
+
+
+def open_storage(storage: str, path: str, shared=False):
+    """Панель нужного типа поверх пустой базы в path (без расширения)"""
+    if storage == 'sqlite': return open_admin_panel('sqlite', path + '.db', shared=shared)
+    return open_admin_panel(storage, path + '.json')
+
+
+def check_risk_batch(tmp: str, storage: str, shared=False) -> bool:
+    """Пачка apply_counters с несколькими корзинами на uid против тех же строк по одной"""
+    b = risk_bucket()
+    # Первые строки без угроз: uid еще не в индексе риска, кольцо берется из базы
+    rows = [(1, b - 1, 2, 0, 20), (2, b - 1, 4, 0, 40), (1, b, 1, 1, 90), (2, b, 1, 1, 95), (1, b - 2, 3, 1, 150)]
+    risky = []
+    for name, batches in (('batch', [rows]), ('single', [[r] for r in rows])):
+        panel = open_storage(storage, os.path.join(tmp, f'risk_{storage}_{shared}_{name}'), shared)
+        for uid in (1, 2): panel.add_user(uid, f'user{uid}', 'Тест')
+        for batch in batches:
+            panel.apply_counters(batch, sum(r[2] for r in batch), sum(r[3] for r in batch))
+        risky.append([(u['user_id'], u['analyzes'], u['threats'], u['avg_score']) for u in panel.get_risky_users(10)])
+        panel.close()
+    return risky[0] == risky[1]
+
+
+def measure(panel, users: int, events: int):
+    """Задержки log_analysis в миллисекундах"""
+    latencies = []
+    for i in range(events):
+        uid = 100000000 + (i * 7919) % users
+        start = time.perf_counter()
+        panel.log_analysis(uid, (i * 37) % 100)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def measure_views(panel, users: int, repeat: int = 20):
+    """Средняя задержка экранов админки в миллисекундах"""
+    views = {
+        'stats': lambda: panel.get_stats(),
+        'top5': lambda: panel.get_top_users(5),
+        'risky': lambda: panel.get_risky_users(10),
+        'page': lambda: panel.get_users_page(100000000 + users // 2, 10),
+        'is_blocked': lambda: panel.is_blocked(100000000 + users // 3),
+    }
+    result = {}
+    for name, fn in views.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        result[name] = (time.perf_counter() - start) * 1000 / repeat
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--storages', default='json,journal,sqlite')
+    parser.add_argument('--budget', type=float, default=5.0, help='секунд на замер одного режима')
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage in args.storages.split(','):
+            for shared in ((False, True) if storage == 'sqlite' else (False,)):
+                ok = check_risk_batch(tmp, storage, shared)
+                failures += not ok
+                print(f"risk batch, {storage}{' shared' if shared else ''}: {'OK' if ok else 'FAIL'}")
+    print()
+
+    print(f"{'users':>9} {'storage':>8} {'events':>7} {'p50 ms':>9} {'p99 ms':>9} {'events/s':>10}   views ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in (int(x) for x in args.sizes.split(',')):
+            for storage in args.storages.split(','):
+                db = os.path.join(tmp, f'{storage}_{users}.json')
+                make_db(db, users)
+                if storage == 'sqlite':
+                    migrate_json(db, db + '.db')
+                    db += '.db'
+                panel = open_admin_panel(storage, db)
+                views = measure_views(panel, users, 3 if storage != 'sqlite' and users >= 1000000 else 20)
+                # Оценка числа событий под бюджет времени по первому замеру
+                probe = measure(panel, users, 3)
+                events = max(3, min(20000, int(args.budget * 1000 / max(statistics.mean(probe), 1e-3))))
+                lat = sorted(probe + measure(panel, users, events))
+                p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+                print(f"{users:>9} {storage:>8} {len(lat):>7} {statistics.median(lat):>9.3f} {p99:>9.3f} {1000 / statistics.mean(lat):>10.0f}   "
+                      + ' '.join(f"{k}={v:.3f}" for k, v in views.items()))
+                panel.close()
+                del panel
+                gc.collect()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Сверка и микробенчмарк поиска триггеров.
+
+    python -m benchmarks.bench_triggers [--messages 2000] [--sizes 180,500,1500,3000]
+"""
+import argparse
+import random
+import sys
+import time
+
+from aegis_analyzer_v5 import AEGISAnalyzer
+from benchmarks.corpus import make_corpus
+
+
+def naive_find_triggers(analyzer: AEGISAnalyzer, text: str):
+    """Прежняя реализация: отдельный `keyword in text` на каждое слово"""
+    triggers = []
+    for group in (analyzer.critical_triggers, analyzer.social_engineering, analyzer.phishing, analyzer.regional):
+        for category, data in group.items():
+            for keyword in data['keywords']:
+                if keyword in text:
+                    triggers.append({'name': f"{category}: {keyword}", 'weight': data['weight'], 'category': category})
+    return triggers
+
+
+def check_parity(analyzer: AEGISAnalyzer, corpus) -> int:
+    """Количество расхождений с прежней реализацией"""
+    mismatches = 0
+    for text in corpus:
+        lower = text.lower()
+        if analyzer._find_triggers(lower, analyzer.ruleset) != naive_find_triggers(analyzer, lower):
+            mismatches += 1
+    return mismatches
+
+
+def grow_dictionary(analyzer: AEGISAnalyzer, total: int, seed: int = 1):
+    """Дополняет словари синтетическими словами до `total` ключей"""
+    rng = random.Random(seed)
+    groups = [analyzer.critical_triggers, analyzer.social_engineering, analyzer.phishing, analyzer.regional]
+    current = sum(len(d['keywords']) for g in groups for d in g.values())
+    categories = [d for g in groups for d in g.values()]
+    for _ in range(max(0, total - current)):
+        word = ''.join(rng.choice('абвгдежзиклмнопрстуфхцчшщэюя') for _ in range(rng.randint(5, 12)))
+        rng.choice(categories)['keywords'].append(word)
+    analyzer._compile()
+
+
+def throughput(fn, corpus) -> float:
+    start = time.perf_counter()
+    for text in corpus:
+        fn(text)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--sizes', default='180,500,1000,1500,3000')
+    args = parser.parse_args(argv)
+
+    corpus = [t.lower() for t in make_corpus(args.messages)]
+
+    analyzer = AEGISAnalyzer()
+    mismatches = check_parity(analyzer, corpus)
+    print(f"parity: {len(corpus) - mismatches}/{len(corpus)} совпадений")
+    if mismatches:
+        return 1
+
+    print(f"{'keywords':>9} {'states':>7} {'naive msg/s':>12} {'automaton msg/s':>16} {'speedup':>8}")
+    for size in (int(x) for x in args.sizes.split(',')):
+        analyzer = AEGISAnalyzer()
+        grow_dictionary(analyzer, size)
+        if check_parity(analyzer, corpus[:200]):
+            print(f"parity FAILED at {size} keywords")
+            return 1
+        naive = throughput(lambda t: naive_find_triggers(analyzer, t), corpus)
+        fast = throughput(lambda t: analyzer._find_triggers(t, analyzer.ruleset), corpus)
+        keywords = len(analyzer.ruleset.entries)
+        print(f"{keywords:>9} {analyzer.ruleset.matcher.states:>7} {naive:>12.0f} {fast:>16.0f} {fast / naive:>7.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
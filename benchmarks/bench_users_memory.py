@@ -0,0 +1,84 @@
+"""Память на пользователя: словари {uid: {...}} (прежний формат) против UserTable.
+
+    python -m benchmarks.bench_users_memory [--users 1000000]
+
+Считает tracemalloc-байты на пользователя, размер JSON-снимка и время is_blocked.
+Имена берутся из небольшого пула (как у реальных first_name), username уникальны.
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from admin_users import UserTable
+
+NAMES = ['Алексей', 'Мария', 'Иван', 'Анна', 'Дмитрий', 'Елена', 'Сергей', 'Ольга', 'Андрей', 'Наталья',
+         'Alex', 'John', 'Maria', 'Ali', 'Fatima', 'Wei', 'Li', 'Carlos', 'Ana', 'Yuki']
+
+
+def make_users(n: int, seed=42):
+    """(uid, username, name, joined) - как их присылает Telegram"""
+    rnd = random.Random(seed)
+    base = datetime(2025, 1, 1).timestamp()
+    for i in range(n):
+        yield (100000000 + rnd.randrange(7000000000), f'user{i}' if i % 3 else None,
+               rnd.choice(NAMES) + ('' if i % 5 else f' {i % 100}'), str(datetime.fromtimestamp(base + i * 7.3)))
+
+
+def build_dicts(users):
+    # Запись собирается так же, как в прежнем AdminPanel.add_user: строки приходят из апдейтов, а не из литералов
+    d = {}
+    for uid, username, name, joined in users:
+        d[str(uid)] = {'user_id': str(uid), 'username': username and ''.join(username), 'name': ''.join(name), 'joined': joined, 'analyzes': uid % 50}
+    return d
+
+
+def build_table(users):
+    table = UserTable()
+    for uid, username, name, joined in users:
+        table.add(uid, username and ''.join(username), ''.join(name), joined, uid % 50)
+    return table
+
+
+def measure(build, users):
+    gc.collect()
+    tracemalloc.start()
+    obj = build(users)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000000)
+    args = parser.parse_args(argv)
+    users = list(make_users(args.users))
+    n = len({u[0] for u in users})
+
+    print(f"{'layout':>10} {'bytes/user':>11} {'total MB':>9} {'json MB':>8} {'is_blocked ns':>14}")
+    for layout, build in (('dicts', build_dicts), ('UserTable', build_table)):
+        obj, size = measure(build, users)
+        snapshot = obj if layout == 'dicts' else obj.dump()
+        json_size = len(json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        # Блокировки: прежний dict по строковому uid против словаря по целому uid
+        blocked = ({str(u[0]): {} for u in users[::100]} if layout == 'dicts' else {u[0]: {} for u in users[::100]})
+        probe = [u[0] for u in users[:100000]]
+        start = time.perf_counter()
+        if layout == 'dicts':
+            for uid in probe: str(uid) in blocked
+        else:
+            for uid in probe: int(uid) in blocked
+        ns = (time.perf_counter() - start) * 1e9 / len(probe)
+        print(f"{layout:>10} {size / n:>11.0f} {size / 2 ** 20:>9.1f} {json_size / 2 ** 20:>8.1f} {ns:>14.0f}")
+        del obj, snapshot, blocked
+        gc.collect()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Несколько процессов-обработчиков с общей SQLite-базой: масштабирование и согласованность.
+
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--messages 20000] [--users 2000] [--queue-size 10000]
+
+Каждый процесс выполняет то же, что хендлер analyze бота (без Telegram): is_blocked, add_user,
+анализ, log_analysis через WriteBehindPanel поверх общей базы. Проверяется: счетчики не теряются,
+блокировка из главного процесса видна обработчикам сразу, порядок апдейтов пользователя сохранен
+(в том числе при полной очереди процесса: проверяется с маленьким --queue-size). Отдельно:
+умерший процесс не вешает dispatch, drain и stop - его апдейты считаются в dropped.
+Масштабирование ограничено числом ядер: на 1 CPU процессы только делят одно ядро.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from admin_panel import WriteBehindPanel, open_admin_panel
+from aegis_workers import WorkerGroup, consume
+from benchmarks.corpus import make_corpus
+
+
+def _worker(index, queue, db, results):
+    """Процесс-обработчик: как bot_v5.serve_worker, но хендлер - голый конвейер анализа"""
+    from aegis_analyzer_v5 import AEGISAnalyzer
+    analyzer = AEGISAnalyzer()
+    admin = WriteBehindPanel(open_admin_panel('sqlite', db, shared=True))
+    admin.start()
+    stats = {'handled': 0, 'skipped_blocked': 0, 'out_of_order': 0}
+    last_seq = {}
+
+    async def handle(payload):
+        uid, seq, text, must_skip = payload
+        if seq <= last_seq.get(uid, -1): stats['out_of_order'] += 1
+        last_seq[uid] = seq
+        if admin.is_blocked(uid):
+            stats['skipped_blocked'] += 1
+            return
+        if must_skip: stats['missed_block'] = stats.get('missed_block', 0) + 1
+        admin.add_user(uid, f'user{uid}', 'Тест')
+        admin.log_analysis(uid, analyzer.analyze(text)['score'])
+        stats['handled'] += 1
+
+    results.put(('ready', index))
+    asyncio.run(consume(queue, handle))
+    admin.close()
+    results.put(('done', index, stats))
+
+
+def _dying_worker(index, queue, delay):
+    time.sleep(delay)  # очередь не читается, затем процесс падает
+    sys.exit(3)
+
+
+def check_dead_worker(updates=200, queue_size=2, timeout=60.0):
+    """Процесс не читает очередь и умирает, пока перекладчик ждет места в ней: кроме уже лежащих
+    в очереди апдейтов все уходят в dropped, dispatch, drain и stop возвращаются"""
+    group = WorkerGroup(1, _dying_worker, args=(1.0,), queue_size=queue_size, put_timeout=0.1)
+    group.start()
+
+    async def flood():
+        for i in range(updates):
+            await group.dispatch(100000000 + i, i)
+        await group.drain()
+
+    start = time.perf_counter()
+    asyncio.run(asyncio.wait_for(flood(), timeout))
+    group.stop(timeout=timeout)
+    return group.dropped[0] == updates - queue_size, time.perf_counter() - start
+
+
+async def drive(group, corpus, users, panel, block_every, concurrency=64):
+    """Как фронт бота с concurrent_updates: каждый апдейт пересылается своей задачей"""
+    seq, tasks, slots = {}, [], asyncio.Semaphore(concurrency)
+
+    async def forward(uid, payload):
+        try: await group.dispatch(uid, payload)
+        finally: slots.release()
+
+    for i, text in enumerate(corpus):
+        uid = 100000000 + (i * 7919) % users
+        must_skip = False
+        if block_every and i % block_every == block_every - 1:
+            panel.block_user(uid, 'bench')  # блокировка из главного процесса, сразу за ней - апдейт этого пользователя
+            must_skip = True
+        seq[uid] = seq.get(uid, -1) + 1
+        await slots.acquire()
+        tasks.append(asyncio.create_task(forward(uid, (uid, seq[uid], text, must_skip))))
+    await asyncio.gather(*tasks)
+    await group.drain()
+
+
+def run(workers, corpus, users, block_every, queue_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'aegis_users.db')
+        panel = open_admin_panel('sqlite', db, shared=True)
+        ctx_results = multiprocessing.get_context('spawn').Queue()
+        group = WorkerGroup(workers, _worker, args=(db, ctx_results), queue_size=queue_size)
+        group.start()
+        for _ in range(workers):
+            ctx_results.get()  # все процессы подняли анализатор и базу
+
+        start = time.perf_counter()
+        asyncio.run(drive(group, corpus, users, panel, block_every))
+        group.stop(timeout=600)
+        elapsed = time.perf_counter() - start
+
+        totals = {}
+        for _ in range(workers):
+            _, _, stats = ctx_results.get()
+            for k, v in stats.items():
+                totals[k] = totals.get(k, 0) + v
+        s = panel.get_stats()
+        per_user = sum(u['analyzes'] for u in panel.get_users_page(None, users + 1))
+        panel.close()
+    return elapsed, totals, s, per_user
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--block-every', type=int, default=500, help="каждый N-й апдейт идет сразу после блокировки автора")
+    parser.add_argument('--queue-size', type=int, default=10000, help="размер очереди процесса (маленький - проверка порядка при backpressure)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    corpus = make_corpus(args.messages, seed=args.seed)
+
+    print(f"cpus: {os.cpu_count()}")
+    print(f"{'workers':>7} {'msg/s':>8} {'speedup':>8} {'efficiency':>10} {'handled':>8} {'lost':>5} {'missed block':>12} {'reordered':>9}")
+    base, failures = None, 0
+    for n in (int(x) for x in args.workers.split(',')):
+        elapsed, totals, s, per_user = run(n, corpus, args.users, args.block_every, args.queue_size)
+        rate = args.messages / elapsed
+        base = base or rate
+        # Потерянные инкременты: обработано процессами, но нет в общей базе
+        lost = totals['handled'] - s['analyzes'] + abs(per_user - s['analyzes'])
+        missed = totals.get('missed_block', 0)
+        failures += bool(lost or missed or totals['out_of_order'])
+        print(f"{n:>7} {rate:>8.0f} {rate / base:>7.2f}x {rate / base / n:>10.0%} {totals['handled']:>8} {lost:>5} "
+              f"{missed:>12} {totals['out_of_order']:>9}")
+    ok, elapsed = check_dead_worker()
+    failures += not ok
+    print(f"\nумерший процесс: {'OK' if ok else 'FAIL'} ({elapsed * 1000:.0f} ms на dispatch + drain + stop)")
+    print(f"{'OK' if not failures else 'FAIL'}: общий счетчик = сумма по пользователям = обработано; блокировки видны сразу")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import random
+from typing import List
+
+# === ШАБЛОНЫ СООБЩЕНИЙ ===
+SCAM_RU = [
+    "Мама, я в беде, телефон упал, это мой новый номер. Срочно нужны деньги, скинь {amount} рублей на карту {card}",
+    "Здравствуйте, служба безопасности Сбербанк. По вашей карте подозрительная операция, продиктуйте код из смс",
+    "Это МВД. На вас заведено уголовное дело, для отмены ареста переведите {amount} рублей немедленно",
+    "Привет, {name}! Это я, узнаешь? Я застрял, помощь нужна, скинь срочно {amount} на карту",
+    "Удаленно работа без опыта, заработок {amount} рублей, деньги каждый день. Пиши в telegram",
+    "Ого, посмотри что про тебя выложили в группе вк: bit.ly/{slug} удали пока не поздно",
+    "Скачай файл exe и установи обновление за 30 минут, иначе аккаунт заблокирован",
+    "Ваш аккаунт заблокирован. Подтвердите данные: secure-{slug}.xyz/login за 24 часа",
+    "Это директор. Не звони, я в самолете, интернет плохой. Срочный платеж, контракт срывается, конфиденциально",
+    "Вы выиграли приз в лотерея! Бонус {amount} рублей, для получения введите номер карты и cvv",
+]
+SCAM_EN = [
+    "Your account has been suspended. Verify your login at http://secure-{slug}.online/update within 1 hour",
+    "Hi {name}, confirm your password and 2fa code to unlock the payment, bit.ly/{slug}",
+    "Download the .exe from www.{slug}.tk and confirm the update, sberbank security team",
+]
+BENIGN_RU = [
+    "Привет, {name}! Как дела? Встретимся завтра в кафе в {hour} часов?",
+    "Не забудь купить хлеб и молоко по дороге домой",
+    "Спасибо за вчерашний вечер, было очень весело",
+    "Отчет по проекту отправил на почту, посмотри когда будет время",
+    "Погода сегодня отличная, пойдем гулять в парк",
+    "Напоминаю, что собрание переносится на {hour}:00",
+]
+BENIGN_EN = [
+    "Hey {name}, are we still on for lunch tomorrow at {hour}?",
+    "The build is green again, thanks for the quick fix",
+    "Let me know when you have time to review the document",
+]
+FILLER = [
+    "В общем, ситуация такая, что нужно обсудить несколько моментов.",
+    "Кстати, я тут подумал и решил, что лучше сделать по-другому.",
+    "Meanwhile the weather was nice and we walked along the river for a while.",
+    "Дальше было длинное описание, которое обычно пересылают целиком.",
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod.",
+]
+NAMES = ["Саша", "Маша", "Дима", "Оля", "Alex", "Kate", "Иван", "Nick"]
+
+
+def _fill(rng: random.Random, template: str) -> str:
+    return template.format(
+        name=rng.choice(NAMES),
+        amount=rng.choice([5000, 15000, 50000, 100000, rng.randint(1000, 99999)]),
+        card=' '.join(str(rng.randint(1000, 9999)) for _ in range(4)),
+        slug=''.join(rng.choice('abcdefghkmnpqrstuvwxyz') for _ in range(6)),
+        hour=rng.randint(9, 21),
+    )
+
+
+def make_message(rng: random.Random, scam_ratio: float = 0.4, long_ratio: float = 0.1) -> str:
+    """Одно синтетическое сообщение (RU/EN, скам/обычное, короткое/длинное)"""
+    if rng.random() < scam_ratio:
+        pool = SCAM_RU if rng.random() < 0.8 else SCAM_EN
+    else:
+        pool = BENIGN_RU if rng.random() < 0.8 else BENIGN_EN
+    text = _fill(rng, rng.choice(pool))
+    if rng.random() < long_ratio:
+        # Длинное сообщение: текст теряется в "простыне" до лимита Telegram
+        parts = [text]
+        while sum(len(p) for p in parts) < rng.randint(1500, 4000):
+            parts.append(rng.choice(FILLER))
+        rng.shuffle(parts)
+        text = ' '.join(parts)[:4096]
+    return text
+
+
+def make_corpus(n: int, seed: int = 42, scam_ratio: float = 0.4, long_ratio: float = 0.1) -> List[str]:
+    """Воспроизводимый корпус из n сообщений"""
+    rng = random.Random(seed)
+    return [make_message(rng, scam_ratio, long_ratio) for _ in range(n)]
+
+
+def _vary(rng: random.Random, text: str) -> str:
+    """Вариация рассылки: другие имена/суммы, лишние пробелы, регистр"""
+    for name in NAMES:
+        if name in text and rng.random() < 0.7:
+            text = text.replace(name, rng.choice(NAMES))
+    words = text.split(' ')
+    if rng.random() < 0.5:
+        i = rng.randrange(len(words))
+        words[i] = words[i] + ' '
+    text = ' '.join(words)
+    if rng.random() < 0.2:
+        text = text.upper()
+    return text
+
+
+def make_campaign_corpus(n: int, seed: int = 42, campaigns: int = 20, campaign_ratio: float = 0.8) -> List[str]:
+    """Корпус "волн" рассылок: campaign_ratio сообщений - вариации нескольких шаблонов"""
+    rng = random.Random(seed)
+    # Каждая кампания: шаблон с фиксированной ссылкой, но переменными именем и суммой
+    bases = [rng.choice(SCAM_RU + SCAM_EN).replace('{slug}', ''.join(rng.choice('abcdefghkmnpqrstuvwxyz') for _ in range(6)))
+             for _ in range(campaigns)]
+    corpus = []
+    for _ in range(n):
+        if rng.random() < campaign_ratio:
+            corpus.append(_vary(rng, _fill(rng, rng.choice(bases))))
+        else:
+            corpus.append(make_message(rng, long_ratio=0.05))
+    return corpus
@@ -0,0 +1,286 @@
+"""Локальная замена Bot API и генератор нагрузки: прием апдейтов и задержка ответа без Telegram.
+
+    python -m benchmarks.fake_bot_api [--mode webhook|polling] [--updates 5000] [--rate 2000] [--drain]
+
+Поднимает поддельный Bot API (getMe, setWebhook, getUpdates, sendMessage, ...), запускает
+bot_v5.py отдельным процессом с AEGIS_BOT_API_URL на него и шлет апдейты по расписанию:
+в режиме webhook - POST на webhook бота через пул keep-alive соединений, в режиме polling -
+через очередь getUpdates. Задержка ответа считается от запланированного момента отправки
+(без coordinated omission). В конце боту отправляется SIGINT; --drain делает это сразу после
+последнего апдейта и проверяет, что все принятые апдейты все равно получили ответ.
+Нужны telegram[webhooks] и dotenv.
+"""
+from collections import Counter, deque
+from urllib.parse import parse_qsl, urlsplit
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import make_corpus
+from benchmarks.fakes import ROOT
+
+TOKEN = '123456:FAKE'
+
+
+# === МИНИМАЛЬНЫЙ HTTP/1.1 (keep-alive, Content-Length) ===
+async def read_message(reader):
+    """(стартовая строка, заголовки, тело) или None при закрытом соединении"""
+    line = await reader.readline()
+    if not line:
+        return None
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = h.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return line.decode('latin-1').rstrip('\r\n'), headers, body
+
+
+def http_response(payload, status='200 OK') -> bytes:
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    return (f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n").encode('latin-1') + body
+
+
+class FakeBotAPI:
+    """Поддельный Bot API: отвечает на вызовы бота и запоминает время первого ответа в каждый чат"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.host, self.port = host, port
+        self.latency = latency      # задержка каждого ответа: RTT до настоящего Bot API
+        self.calls = Counter()
+        self.replies = {}           # chat_id -> perf_counter первого sendMessage/editMessageText
+        self.updates = deque()      # очередь для getUpdates
+        self.webhook = None
+        self.webhook_set = asyncio.Event()
+        self._new_updates = asyncio.Event()
+        self._message_id = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._client, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._new_updates.set()  # висящие long-poll getUpdates возвращаются сразу
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    def push_update(self, update):
+        self.updates.append(update)
+        self._new_updates.set()
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                request = await read_message(reader)
+                if request is None:
+                    break
+                start_line, headers, body = request
+                target = start_line.split(' ')[1]
+                params = dict(parse_qsl(urlsplit(target).query))
+                if headers.get('content-type', '').startswith('application/json') and body:
+                    params.update(json.loads(body))
+                elif body:
+                    params.update(parse_qsl(body.decode('utf-8')))
+                result = await self._call(urlsplit(target).path.rsplit('/', 1)[-1], params)
+                writer.write(http_response({'ok': True, 'result': result}))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _call(self, method, params):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method == 'getMe':
+            return {'id': int(TOKEN.split(':')[0]), 'is_bot': True, 'first_name': 'AEGIS', 'username': 'aegis_test_bot'}
+        if method == 'setWebhook':
+            self.webhook = params.get('url')
+            self.webhook_set.set()
+            return True
+        if method == 'deleteWebhook':
+            self.webhook = None
+            return True
+        if method == 'getUpdates':
+            return await self._get_updates(int(params.get('offset', 0) or 0), int(params.get('limit', 100) or 100),
+                                           float(params.get('timeout', 0) or 0))
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id') or 0)
+            self.replies.setdefault(chat_id, time.perf_counter())
+            self._message_id += 1
+            return {'message_id': self._message_id, 'date': int(time.time()), 'text': params.get('text', ''),
+                    'chat': {'id': chat_id, 'type': 'private'}}
+        return True  # answerCallbackQuery, deleteMyCommands, close и прочее
+
+    async def _get_updates(self, offset, limit, timeout):
+        while self.updates and self.updates[0]['update_id'] < offset:
+            self.updates.popleft()  # подтверждены ботом
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return [self.updates[i] for i in range(min(limit, len(self.updates)))]
+
+
+def make_update(update_id: int, chat_id: int, text: str):
+    user = {'id': chat_id, 'is_bot': False, 'first_name': 'Тест', 'username': f'user{chat_id}'}
+    return {'update_id': update_id, 'message': {'message_id': update_id, 'date': int(time.time()), 'text': text,
+                                                'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Тест'}, 'from': user}}
+
+
+# === ГЕНЕРАТОР НАГРУЗКИ ===
+async def fire_webhook(url, updates, rate, connections, secret=None):
+    """POST апдейтов по расписанию через `connections` keep-alive соединений.
+    Возвращает (due по chat_id, время подтверждения 200 по chat_id)"""
+    parts = urlsplit(url)
+    queue = asyncio.Queue()
+    due, acked = {}, {}
+    extra = f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n" if secret else ""
+
+    async def worker():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                chat_id, body = item
+                writer.write((f"POST {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/json\r\n"
+                              f"Content-Length: {len(body)}\r\n{extra}\r\n").encode('latin-1') + body)
+                response = await read_message(reader)
+                if response and response[0].split(' ')[1] == '200':
+                    acked[chat_id] = time.perf_counter()
+        finally:
+            writer.close()
+
+    workers = [asyncio.create_task(worker()) for _ in range(connections)]
+    start = time.perf_counter()
+    for i, update in enumerate(updates):
+        moment = start + i / rate
+        delay = moment - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        chat_id = update['message']['chat']['id']
+        due[chat_id] = moment
+        queue.put_nowait((chat_id, json.dumps(update, ensure_ascii=False).encode('utf-8')))
+    for _ in workers:
+        queue.put_nowait(None)
+    await asyncio.gather(*workers)
+    return due, acked
+
+
+async def fire_polling(api, updates, rate):
+    """Апдейты в очередь getUpdates по расписанию; подтверждение = бот забрал апдейт"""
+    due = {}
+    start = time.perf_counter()
+    for i, update in enumerate(updates):
+        moment = start + i / rate
+        delay = moment - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        due[update['message']['chat']['id']] = moment
+        api.push_update(update)
+    while api.updates and api.calls['getUpdates']:
+        await asyncio.sleep(0.01)
+    return due, dict.fromkeys(due, time.perf_counter())
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000 if values else float('nan')
+
+
+async def run(args):
+    api = FakeBotAPI()
+    await api.start()
+    workdir = tempfile.mkdtemp()
+    webhook = f"http://127.0.0.1:{args.webhook_port}/aegis"
+    env = {**os.environ, 'TELEGRAM_BOT_TOKEN': TOKEN, 'AEGIS_BOT_API_URL': api.base_url, 'AEGIS_MODE': args.mode,
+           'AEGIS_WEBHOOK_LISTEN': '127.0.0.1', 'AEGIS_WEBHOOK_PORT': str(args.webhook_port), 'AEGIS_WEBHOOK_URL': webhook,
+           'AEGIS_WEBHOOK_SECRET': args.secret, 'AEGIS_STORAGE': args.storage, 'AEGIS_RULES_POLL': '0',
+           'AEGIS_CONCURRENT_UPDATES': str(args.concurrent_updates), 'AEGIS_MAX_INFLIGHT': str(args.concurrent_updates * 4)}
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'bot_v5.py')], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    try:
+        # Готовность: webhook зарегистрирован (сервер бота уже слушает) или бот начал опрос
+        deadline = time.perf_counter() + args.startup_timeout
+        while not (api.webhook_set.is_set() if args.mode == 'webhook' else api.calls['getUpdates']):
+            if proc.poll() is not None or time.perf_counter() > deadline:
+                print("❌ бот не поднялся (запустите с --verbose)", file=sys.stderr)
+                return 1
+            await asyncio.sleep(0.05)
+
+        corpus = make_corpus(args.updates, seed=args.seed)
+        updates = [make_update(i + 1, 1000000000 + i, text) for i, text in enumerate(corpus)]
+        start = time.perf_counter()
+        if args.mode == 'webhook':
+            due, acked = await fire_webhook(api.webhook, updates, args.rate, args.connections, args.secret)
+        else:
+            due, acked = await fire_polling(api, updates, args.rate)
+        intake = len(acked) / (time.perf_counter() - start)
+
+        if args.drain:
+            proc.send_signal(signal.SIGINT)  # остановка сразу: принятые апдейты должны дообработаться
+        deadline = time.perf_counter() + args.reply_timeout
+        while len(api.replies) < len(acked) and time.perf_counter() < deadline and (not args.drain or proc.poll() is None):
+            await asyncio.sleep(0.02)
+        if not args.drain:
+            proc.send_signal(signal.SIGINT)
+        # Ответы, которые бот успеет отправить при остановке, тоже учитываются
+        while proc.poll() is None and time.perf_counter() < deadline + args.reply_timeout:
+            await asyncio.sleep(0.02)
+        elapsed = max(api.replies.values(), default=start) - start
+
+        latencies = [api.replies[c] - due[c] for c in acked if c in api.replies]
+        lost = len(acked) - len(latencies)
+        print(f"{'mode':>8} {'sent':>6} {'acked':>6} {'intake/s':>9} {'replies/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'lost':>5}")
+        print(f"{args.mode:>8} {len(updates):>6} {len(acked):>6} {intake:>9.0f} {len(latencies) / max(elapsed, 1e-9):>10.0f} "
+              f"{percentile(latencies, .5):>8.1f} {percentile(latencies, .99):>8.1f} {lost:>5}")
+        if args.drain:
+            print(f"graceful drain: {'OK' if not lost else 'FAIL'} (exit code {proc.returncode})")
+        return 1 if lost else 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        await api.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('webhook', 'polling'), default='webhook')
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=2000, help="апдейтов в секунду")
+    parser.add_argument('--connections', type=int, default=64, help="параллельных соединений к webhook")
+    parser.add_argument('--concurrent-updates', type=int, default=256)
+    parser.add_argument('--webhook-port', type=int, default=8443)
+    parser.add_argument('--secret', default='aegis-bench')
+    parser.add_argument('--storage', default='sqlite')
+    parser.add_argument('--drain', action='store_true', help="SIGINT сразу после последнего апдейта")
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument('--reply-timeout', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-v', '--verbose', action='store_true', help="показывать stderr бота")
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Поддельные Update/CallbackQuery для прогона хендлеров bot_v5 без сети."""
+import importlib
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeMessage:
+    def __init__(self, text: str):
+        self.text = text
+        self.created = time.perf_counter()
+        self.replies = []  # (задержка ответа в секундах, текст)
+
+    async def reply_html(self, text, reply_markup=None, **kwargs):
+        self.replies.append((time.perf_counter() - self.created, text))
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        self.replies.append((time.perf_counter() - self.created, text))
+
+
+class FakeCallbackQuery:
+    def __init__(self, data: str, user):
+        self.data = data
+        self.from_user = user
+        self.created = time.perf_counter()
+        self.answers = []
+        self.edits = []  # (задержка в секундах, текст)
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        self.answers.append(text)
+
+    async def edit_message_text(self, text, parse_mode=None, reply_markup=None, **kwargs):
+        self.edits.append((time.perf_counter() - self.created, text))
+
+
+def fake_user(uid: int, first_name: str = 'Тест'):
+    return SimpleNamespace(id=uid, username=f'user{uid}', first_name=first_name)
+
+
+def message_update(uid: int, text: str):
+    user = fake_user(uid)
+    return SimpleNamespace(effective_user=user, message=FakeMessage(text), callback_query=None)
+
+
+def callback_update(uid: int, data: str):
+    user = fake_user(uid)
+    return SimpleNamespace(effective_user=user, message=None, callback_query=FakeCallbackQuery(data, user))
+
+
+def load_bot(workdir: str, **env):
+    """Импорт bot_v5 с базой в workdir и заданными AEGIS_* переменными (нужны telegram и dotenv)"""
+    os.environ.update({'TELEGRAM_BOT_TOKEN': '0:fake', **env})
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)  # после chdir '' в sys.path указывает уже на workdir
+    os.chdir(workdir)
+    if 'bot_v5' in sys.modules:
+        return importlib.reload(sys.modules['bot_v5'])
+    return importlib.import_module('bot_v5')
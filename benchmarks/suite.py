@@ -0,0 +1,248 @@
+"""Воспроизводимый набор бенчмарков: анализатор, хранилища AdminPanel, хендлеры bot_v5.
+
+    python -m benchmarks.suite -o baseline.json                     # полный прогон (1k/100k/1M пользователей)
+    python -m benchmarks.suite --quick -o current.json --compare baseline.json [--threshold 0.15]
+    python -m benchmarks.suite --compare baseline.json current.json # сравнить два готовых файла
+
+Все метрики плоские: {"имя": {"value", "unit", "better": "higher" | "lower"}}.
+При сравнении метрика, ухудшившаяся больше чем на threshold (p95/p99 - на 2 x threshold), считается
+регрессией (код возврата 1); изменения в пределах долей микросекунд игнорируются как шум.
+Корпус и нагрузка детерминированы seed; числа сравнимы только на одной машине.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from admin_panel import open_admin_panel
+from admin_sqlite import migrate_json
+from aegis_analyzer_v5 import AEGISAnalyzer
+from benchmarks.bench_storage import make_db, measure, measure_views
+from benchmarks.corpus import make_corpus
+from benchmarks.fakes import callback_update, load_bot, message_update
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float('nan')
+
+
+def metric(results, name, value, unit, better):
+    results[name] = {'value': round(value, 6), 'unit': unit, 'better': better}
+
+
+def latency_metrics(results, prefix, latencies, unit='ms', scale=1000):
+    """p50/p95/p99 по списку задержек в секундах"""
+    for q in (0.5, 0.95, 0.99):
+        metric(results, f"{prefix}.p{int(q * 100)}_{unit}", percentile(latencies, q) * scale, unit, 'lower')
+
+
+# === АНАЛИЗАТОР ===
+def bench_analyzer(results, args):
+    analyzer = AEGISAnalyzer()
+    corpus = make_corpus(args.messages, seed=args.seed)
+
+    start = time.perf_counter()
+    AEGISAnalyzer()
+    metric(results, 'analyzer.init_ms', (time.perf_counter() - start) * 1000, 'ms', 'lower')
+
+    best, latencies = 0.0, {'short': [], 'long': []}
+    for _ in range(args.repeats):
+        run_start = time.perf_counter()
+        for text in corpus:
+            start = time.perf_counter()
+            analyzer.analyze(text)
+            latencies['long' if len(text) >= 1000 else 'short'].append(time.perf_counter() - start)
+        best = max(best, len(corpus) / (time.perf_counter() - run_start))
+    metric(results, 'analyzer.analyze.msg_per_sec', best, 'msg/s', 'higher')
+    latency_metrics(results, 'analyzer.analyze', latencies['short'] + latencies['long'], 'us', 1e6)
+    for kind, values in latencies.items():
+        latency_metrics(results, f'analyzer.analyze.{kind}', values, 'us', 1e6)
+
+    best = 0.0
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        analyzer.analyze_batch(corpus)
+        best = max(best, len(corpus) / (time.perf_counter() - start))
+    metric(results, 'analyzer.analyze_batch.msg_per_sec', best, 'msg/s', 'higher')
+
+
+# === ХРАНИЛИЩА ===
+def bench_storage(results, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in args.sizes:
+            for storage in args.storages:
+                db = os.path.join(tmp, f'{storage}_{users}.json')
+                make_db(db, users)
+                if storage == 'sqlite':
+                    migrate_json(db, db + '.db')
+                    db += '.db'
+                prefix = f'storage.{storage}.{users}'
+                opens = []
+                for attempt in range(args.repeats):
+                    if attempt: panel.close()
+                    start = time.perf_counter()
+                    panel = open_admin_panel(storage, db)
+                    opens.append(time.perf_counter() - start)
+                metric(results, f'{prefix}.open_ms', min(opens) * 1000, 'ms', 'lower')
+
+                # Минимум по повторам: экраны админки - микросекунды, одиночный замер шумит
+                runs = [measure_views(panel, users, 3 if storage != 'sqlite' and users >= 1000000 else 20) for _ in range(args.repeats)]
+                for view in runs[0]:
+                    metric(results, f'{prefix}.view_{view}_ms', min(r[view] for r in runs), 'ms', 'lower')
+                # Число событий под бюджет времени: JSON на миллионе пользователей переписывает файл на каждое событие
+                probe = measure(panel, users, 3)
+                events = max(3, min(args.events, int(args.budget * 1000 / max(sum(probe) / len(probe), 1e-3))))
+                lat = [ms / 1000 for ms in probe + measure(panel, users, events)]
+                latency_metrics(results, f'{prefix}.log_analysis', lat)
+
+                start = time.perf_counter()
+                for i in range(min(events, 1000)):
+                    panel.add_user(900000000 + i, f'new{i}', 'Новый')
+                metric(results, f'{prefix}.add_user_ms', (time.perf_counter() - start) * 1000 / min(events, 1000), 'ms', 'lower')
+                panel.close()
+                del panel
+                gc.collect()
+
+
+# === ХЕНДЛЕРЫ bot_v5 (поддельные Update, без сети) ===
+async def drive_handlers(bot, corpus, results, repeats):
+    timings = {'start': [], 'analyze': [], 'stats': [], 'admin_full_stats': [], 'admin_users_list': [], 'admin_top_users': [], 'admin_risky': []}
+    for i, text in enumerate(corpus * repeats):
+        uid = 100000000 + i % 500
+        start = time.perf_counter()
+        if i % 50 == 0:
+            await bot.start(message_update(uid, '/start'), None)
+            timings['start'].append(time.perf_counter() - start)
+            continue
+        await bot.analyze(message_update(uid, text), None)
+        timings['analyze'].append(time.perf_counter() - start)
+        if i % 20 == 0:
+            for data in ('stats', 'admin_full_stats', 'admin_users_list', 'admin_top_users', 'admin_risky'):
+                update = callback_update(bot.ADMIN_ID if data.startswith('admin_') else uid, data)
+                start = time.perf_counter()
+                await bot.button_callback(update, None)
+                timings[data].append(time.perf_counter() - start)
+    for name, values in timings.items():
+        latency_metrics(results, f'handlers.{name}', values)
+    total = sum(sum(v) for v in timings.values())
+    metric(results, 'handlers.updates_per_sec', sum(len(v) for v in timings.values()) / total, 'upd/s', 'higher')
+
+
+def bench_handlers(results, args):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            bot = load_bot(tmp, AEGIS_STORAGE=args.handler_storage, AEGIS_METRICS='0', AEGIS_RULES_POLL='0')
+        except ImportError as e:
+            print(f"handlers: пропущено, bot_v5 не импортируется ({e})", file=sys.stderr)
+            return
+        try:
+            asyncio.run(drive_handlers(bot, make_corpus(args.handler_messages, seed=args.seed), results, args.repeats))
+        finally:
+            bot.admin.close()
+            bot.pool.shutdown()
+            os.chdir(cwd)
+
+
+# === СРАВНЕНИЕ ===
+# Изменения меньше этих величин - шум таймера и планировщика, а не регрессия
+NOISE_FLOOR = {'ms': 0.005, 'us': 5.0}
+
+
+def compare(baseline, current, threshold):
+    """Таблица изменений; возвращает список регрессий.
+    Хвостовые перцентили (p95/p99) сравниваются с удвоенным порогом: на тысячах замеров они шумнее медианы."""
+    regressions = []
+    print(f"{'metric':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        old, new = baseline['results'][name], current['results'][name]
+        if not old['value']:
+            continue
+        change = new['value'] / old['value'] - 1
+        worse = -change if old['better'] == 'higher' else change
+        limit = threshold * 2 if '.p95_' in name or '.p99_' in name else threshold
+        flag = ''
+        if worse > limit and abs(new['value'] - old['value']) >= NOISE_FLOOR.get(old['unit'], 0):
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<52} {old['value']:>12.4g} {new['value']:>12.4g} {change:>+8.1%}{flag}")
+    missing = sorted(set(baseline['results']) - set(current['results']))
+    if missing:
+        print(f"нет в текущем прогоне: {', '.join(missing)}")
+    return regressions
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'rules_version': AEGISAnalyzer().rules_version,
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help="с --compare: готовый файл результатов вместо нового прогона")
+    parser.add_argument('--only', default='analyzer,storage,handlers')
+    parser.add_argument('--quick', action='store_true', help="меньше сообщений и без 1M пользователей")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--messages', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--sizes', default=None, help="число пользователей, по умолчанию 1000,100000,1000000")
+    parser.add_argument('--storages', default='json,journal,sqlite')
+    parser.add_argument('--events', type=int, default=5000, help="максимум событий log_analysis на замер")
+    parser.add_argument('--budget', type=float, default=3.0, help="секунд на замер одного хранилища")
+    parser.add_argument('--handler-messages', type=int, default=500)
+    parser.add_argument('--handler-storage', default='sqlite')
+    parser.add_argument('-o', '--output', help="куда записать JSON (по умолчанию stdout)")
+    parser.add_argument('--compare', metavar='BASELINE', help="сравнить с сохраненным прогоном")
+    parser.add_argument('--threshold', type=float, default=0.15, help="допустимое ухудшение, доля")
+    args = parser.parse_args(argv)
+    args.messages = args.messages or (2000 if args.quick else 10000)
+    args.sizes = [int(x) for x in (args.sizes or ('1000,100000' if args.quick else '1000,100000,1000000')).split(',')]
+    args.storages = args.storages.split(',')
+
+    if args.compare and args.files:
+        with open(args.files[0], encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        results = {}
+        for name in args.only.split(','):
+            print(f"▶ {name}", file=sys.stderr)
+            {'analyzer': bench_analyzer, 'storage': bench_storage, 'handlers': bench_handlers}[name](results, args)
+        current = {'meta': metadata(args), 'results': results}
+        text = json.dumps(current, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+        elif not args.compare:
+            print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        print(f"\n{'FAIL' if regressions else 'OK'}: {len(regressions)} регрессий хуже {args.threshold:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,88 +1,161 @@
-import os, logging
+import os, logging, asyncio
+from collections import Counter
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler, TypeHandler
 from dotenv import load_dotenv
-from admin_panel import AdminPanel
+from admin_panel import WriteBehindPanel, open_admin_panel
 from aegis_analyzer_v5 import AEGISAnalyzer
+from aegis_cache import VerdictCache
+from aegis_flood import BLOCK, THROTTLED, TOO_LONG, FloodControl
+from aegis_metrics import Metrics
+from aegis_pool import AnalysisPool, PoolBusy
 
 load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 ADMIN_ID = 1763545779  # ❗ ВСТАВЬ СВОЙ ID
 
-analyzer = AEGISAnalyzer()
-admin = AdminPanel()
-
-def get_main_menu():
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("🔍 Что я умею?", callback_data='about')],
-        [InlineKeyboardButton("📊 Статистика", callback_data='stats')],
-        [InlineKeyboardButton("📚 Типы угроз", callback_data='threats')],
-        [InlineKeyboardButton("🔐 Политика", callback_data='privacy')]
-    ])
-
-def get_back_menu(): return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data='start')]])
-
-def get_admin_menu():
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("📊 Полная статистика", callback_data='admin_full_stats')],
-        [InlineKeyboardButton("👥 Список пользователей", callback_data='admin_users_list')],
-        [InlineKeyboardButton("🚫 Заблокированные", callback_data='admin_blocked')],
-        [InlineKeyboardButton("⭐ Топ пользователей", callback_data='admin_top_users')],
-        [InlineKeyboardButton("⚠️ Рискованные", callback_data='admin_risky')],
-        [InlineKeyboardButton("⬅️ Вернуться", callback_data='start')]
-    ])
+# Метрики этапов анализа, хранилища и хендлеров; AEGIS_METRICS=0 выключает их без накладных расходов
+metrics = Metrics(enabled=os.getenv("AEGIS_METRICS", "1") != "0")
+# Правила в aegis_rules.json (AEGIS_RULES); файл опрашивается раз в AEGIS_RULES_POLL секунд, 0 - без перезагрузки
+# AEGIS_ANALYZE_BOUNDED=1: длинные тексты анализируются по частям с ранним выходом, AEGIS_ANALYZE_BUDGET - предел символов
+ANALYZE_BUDGET = int(os.getenv("AEGIS_ANALYZE_BUDGET", "0")) or None
+analyzer = metrics.instrument_analyzer(AEGISAnalyzer(os.getenv("AEGIS_RULES"), bounded=os.getenv("AEGIS_ANALYZE_BOUNDED") == "1",
+                                                     budget=ANALYZE_BUDGET))
+RULES_POLL = float(os.getenv("AEGIS_RULES_POLL", "2"))
+# Волны одинаковых рассылок не анализируются заново; AEGIS_NEAR_DUPLICATES=1 склеивает и почти-дубликаты
+verdicts = VerdictCache(analyzer, max_size=int(os.getenv("AEGIS_CACHE_SIZE", "10000")),
+                        near_duplicates=os.getenv("AEGIS_NEAR_DUPLICATES") == "1")
+# Где идет анализ: inline (в event loop) | thread | process; очередь ограничена, сверх нее - "занято"
+pool = AnalysisPool(verdicts.analyze, mode=os.getenv("AEGIS_ANALYZE_MODE", "inline"),
+                    workers=int(os.getenv("AEGIS_WORKERS", str(os.cpu_count() or 2))),
+                    max_inflight=int(os.getenv("AEGIS_MAX_INFLIGHT", "64")),
+                    timeout=float(os.getenv("AEGIS_ANALYZE_TIMEOUT", "10")),
+                    cache_size=verdicts.max_size, near_duplicates=verdicts.near_duplicates,
+                    rules=analyzer.rules_path, rules_poll=RULES_POLL, bounded=analyzer.bounded, budget=analyzer.budget)
+# Счетчики проверок копятся в памяти и сбрасываются фоновым потоком, не блокируя event loop
+# AEGIS_BOT_WORKERS=N > 1: N процессов-обработчиков, апдейты разбиты по uid, общее состояние - в SQLite (AEGIS_STORAGE=sqlite)
+BOT_WORKERS = int(os.getenv("AEGIS_BOT_WORKERS", "1"))
+WORKER_INDEX = None  # номер процесса-обработчика; None - единственный или главный процесс
+workers = None
+admin = WriteBehindPanel(metrics.instrument_panel(open_admin_panel(os.getenv("AEGIS_STORAGE", "json"), shared=BOT_WORKERS > 1)),  # json | journal | sqlite
+                         interval=float(os.getenv("AEGIS_FLUSH_INTERVAL", "2")))
+# Флуд-контроль до анализа: token bucket на пользователя (AEGIS_FLOOD_RATE сообщений/с, запас AEGIS_FLOOD_BURST),
+# длинные тексты дороже; AEGIS_FLOOD_BLOCK=N блокирует после N отказов, каждый не позже 10 минут после предыдущего
+# (strike_window: после паузы дольше окна счет начинается заново; 0 - не блокировать)
+flood = FloodControl(rate=float(os.getenv("AEGIS_FLOOD_RATE", "0.5")), burst=float(os.getenv("AEGIS_FLOOD_BURST", "10")),
+                     max_text=int(os.getenv("AEGIS_MAX_TEXT", "4096")), max_users=int(os.getenv("AEGIS_FLOOD_USERS", "100000")),
+                     block_after=int(os.getenv("AEGIS_FLOOD_BLOCK", "0")))
+metrics.gauge('aegis_queue_depth', 'Глубина очередей', 'queue', 'analysis', lambda: pool.inflight)
+metrics.gauge('aegis_queue_depth', 'Глубина очередей', 'queue', 'write_behind', lambda: admin.pending)
+metrics.gauge('aegis_pool_events_total', 'Отказы и таймауты пула анализа', 'event', 'rejected', lambda: pool.rejected, kind='counter')
+metrics.gauge('aegis_pool_events_total', 'Отказы и таймауты пула анализа', 'event', 'timeout', lambda: pool.timeouts, kind='counter')
+for _event in ('throttled', 'too_long', 'blocked', 'evictions'):
+    metrics.gauge('aegis_flood_events_total', 'Отказы флуд-контроля и вытеснения записей', 'event', _event, lambda k=_event: flood.stats()[k], kind='counter')
+metrics.gauge('aegis_flood_users', 'Пользователей в таблице флуд-контроля', 'table', 'buckets', lambda: len(flood))
+for _result, _key in (('hit', 'hits'), ('near_hit', 'near_hits'), ('miss', 'misses')):
+    metrics.gauge('aegis_cache_lookups_total', 'Обращения к кэшу вердиктов', 'result', _result, lambda k=_key: verdicts.stats()[k], kind='counter')
+PAGE_SIZE = 10
+
+# === СТАТИЧЕСКИЙ ИНТЕРФЕЙС: клавиатуры и тексты собираются один раз, хендлеры отдают готовые объекты ===
+MAIN_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 Что я умею?", callback_data='about')],
+    [InlineKeyboardButton("📊 Статистика", callback_data='stats')],
+    [InlineKeyboardButton("📚 Типы угроз", callback_data='threats')],
+    [InlineKeyboardButton("🔐 Политика", callback_data='privacy')]
+])
+BACK_MENU = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data='start')]])
+ADMIN_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📊 Полная статистика", callback_data='admin_full_stats')],
+    [InlineKeyboardButton("👥 Список пользователей", callback_data='admin_users_list')],
+    [InlineKeyboardButton("🚫 Заблокированные", callback_data='admin_blocked')],
+    [InlineKeyboardButton("⭐ Топ пользователей", callback_data='admin_top_users')],
+    [InlineKeyboardButton("⚠️ Рискованные", callback_data='admin_risky')],
+    [InlineKeyboardButton("📈 Метрики", callback_data='admin_metrics')],
+    [InlineKeyboardButton("⬅️ Вернуться", callback_data='start')]
+])
+# Разделы меню без данных: callback_data -> текст
+STATIC_PAGES = {
+    'about': "🛡️ <b>О БОТЕ</b>\n\nМы защищаем вас от:\n\n🔴 Фишинга\n👤 Соц. инженерии\n🦠 Вредоносов\n💳 Кражи данных\n<b>\nТочность определения: 96-98%</b>",
+    'threats': "📚 <b>ВИДЫ УГРОЗ</b>\n1. Фишинг\n2. Соц. инженерия\n3. BEC\n4. Вредонос\n5. Кража данных\n6. Job scam\n7. Romance scam",
+    'privacy': "🔐 <b>Мы строго соответсвуем <b>GDPR</b> (общему регламенту по защите данных)</b>\n\n✅ Собираем: ID, имя, кол-во проверок\n❌ НЕ собираем: тексты сообщений\n\n/delete_my_data - удалить все мои данные",
+}
+
+def get_page_menu(view, last_uid):
+    """Админ-меню с кнопкой следующей страницы (keyset: после last_uid)"""
+    return InlineKeyboardMarkup([[InlineKeyboardButton("➡️ Далее", callback_data=f'{view}:{last_uid}')], *ADMIN_MENU.inline_keyboard])
+
+def metrics_text():
+    """Сводка метрик для админки: p50 / p99 в мс и число замеров"""
+    if not metrics.enabled: return "📈 Метрики выключены (AEGIS_METRICS=0)"
+    msg = "📈 <b>МЕТРИКИ</b> (p50 / p99, мс)\n\n"
+    for title, name in (("⚙️ Этапы анализа", 'aegis_analyze_stage_seconds'), ("💾 Хранилище", 'aegis_storage_seconds'), ("📨 Хендлеры", 'aegis_handler_seconds')):
+        rows = [f"{k}: {h.quantile(0.5)*1000:.3f} / {h.quantile(0.99)*1000:.3f} ({h.count})" for k, h in metrics.family(name).items() if h.count]
+        if rows: msg += f"<b>{title}</b>\n" + "\n".join(rows) + "\n\n"
+    msg += f"📥 Очередь анализа: {pool.inflight} | буфер записи: {admin.pending}\n"
+    top = Counter(metrics.family('aegis_trigger_hits_total')).most_common(5)
+    if top: msg += "🚩 Категории: " + ", ".join(f"{c} {n}" for c, n in top)
+    return msg
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if admin.is_blocked(user.id): return
     admin.add_user(user.id, user.username, user.first_name)
     text = f"🛡️ <b>AEGIS v5.0 PRO</b>\nПривет, {user.first_name}! Отправь мне сообщение на проверку."
-    if update.message: await update.message.reply_html(text, reply_markup=get_main_menu())
-    else: await update.callback_query.edit_message_text(text, parse_mode='HTML', reply_markup=get_main_menu())
+    if update.message: await update.message.reply_html(text, reply_markup=MAIN_MENU)
+    else: await update.callback_query.edit_message_text(text, parse_mode='HTML', reply_markup=MAIN_MENU)
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     data = query.data
     if data == 'start': await start(update, context)
-    elif data == 'about': await query.edit_message_text("🛡️ <b>О БОТЕ</b>\n\nМы защищаем вас от:\n\n🔴 Фишинга\n👤 Соц. инженерии\n🦠 Вредоносов\n💳 Кражи данных\n<b>\nТочность определения: 96-98%</b>", parse_mode='HTML', reply_markup=get_back_menu())
+    elif data in STATIC_PAGES: await query.edit_message_text(STATIC_PAGES[data], parse_mode='HTML', reply_markup=BACK_MENU)
     elif data == 'stats':
         s = admin.get_stats()
-        await query.edit_message_text(f"📊 <b>СТАТИСТИКА</b>\n👥 Пользователей: {s['users']}\n🔍 Проверок: {s['analyzes']}\n⚠️ Угроз: {s['threats']}\n🚫 Залокировано пользователей: {s['blocked_users']}", parse_mode='HTML', reply_markup=get_back_menu())
-    elif data == 'threats': await query.edit_message_text("📚 <b>ВИДЫ УГРОЗ</b>\n1. Фишинг\n2. Соц. инженерия\n3. BEC\n4. Вредонос\n5. Кража данных\n6. Job scam\n7. Romance scam", parse_mode='HTML', reply_markup=get_back_menu())
-    elif data == 'privacy': await query.edit_message_text("🔐 <b>Мы строго соответсвуем <b>GDPR</b> (общему регламенту по защите данных)</b>\n\n✅ Собираем: ID, имя, кол-во проверок\n❌ НЕ собираем: тексты сообщений\n\n/delete_my_data - удалить все мои данные", parse_mode='HTML', reply_markup=get_back_menu())
+        await query.edit_message_text(f"📊 <b>СТАТИСТИКА</b>\n👥 Пользователей: {s['users']}\n🔍 Проверок: {s['analyzes']}\n⚠️ Угроз: {s['threats']}\n🚫 Залокировано пользователей: {s['blocked_users']}", parse_mode='HTML', reply_markup=BACK_MENU)
     elif 'admin_' in data:
         if query.from_user.id != ADMIN_ID: await query.answer("❌ Нет доступа!", show_alert=True); return
         if data == 'admin_full_stats':
             r = admin.get_admin_report()['summary']
             pct = round(r['threats_detected']/max(r['total_analyzes'],1)*100, 1)
-            await query.edit_message_text(f"📊 <b>ОТЧЕТ</b>\n👥 Пользователей: {r['total_users']}\n🔍 Проверок: {r['total_analyzes']}\n⚠️ Угроз: {r['threats_detected']}\n🚫 Блокировано: {r['blocked_users']}\n📈 % угроз: {pct}%", parse_mode='HTML', reply_markup=get_admin_menu())
-        elif data == 'admin_users_list':
-            users = admin.d.get('users', {})
-            msg = f"👥 <b>ПОЛЬЗОВАТЕЛИ ({len(users)})</b>\n\n" if users else "Нет пользователей"
-            for uid, u in list(users.items())[:10]:
-                msg += f"ID: {uid} | {u.get('name', '?')} | {u.get('analyzes', 0)} проверок\n"
-            await query.edit_message_text(msg, parse_mode='HTML', reply_markup=get_admin_menu())
-        elif data == 'admin_blocked':
-            b = admin.get_blocked_users()
-            msg = f"🚫 <b>ЗАБЛОКИРОВАННЫЕ ({len(b)})</b>\n\n" if b else "✅ Нет заблокированных\n\n"
-            for u in b[:10]:
+            await query.edit_message_text(f"📊 <b>ОТЧЕТ</b>\n👥 Пользователей: {r['total_users']}\n🔍 Проверок: {r['total_analyzes']}\n⚠️ Угроз: {r['threats_detected']}\n🚫 Блокировано: {r['blocked_users']}\n📈 % угроз: {pct}%", parse_mode='HTML', reply_markup=ADMIN_MENU)
+        elif data.startswith('admin_users_list'):
+            view, _, after = data.partition(':')
+            users = admin.get_users_page(after or None, PAGE_SIZE)
+            msg = f"👥 <b>ПОЛЬЗОВАТЕЛИ ({admin.get_stats()['users']})</b>\n\n" if users else "Нет пользователей"
+            for u in users:
+                msg += f"ID: {u['user_id']} | {u.get('name', '?')} | {u.get('analyzes', 0)} проверок\n"
+            menu = get_page_menu(view, users[-1]['user_id']) if len(users) == PAGE_SIZE else ADMIN_MENU
+            await query.edit_message_text(msg, parse_mode='HTML', reply_markup=menu)
+        elif data.startswith('admin_blocked'):
+            view, _, after = data.partition(':')
+            b = admin.get_blocked_page(after or None, PAGE_SIZE)
+            msg = f"🚫 <b>ЗАБЛОКИРОВАННЫЕ ({admin.get_stats()['blocked_users']})</b>\n\n" if b else "✅ Нет заблокированных\n\n"
+            for u in b:
                 msg += f"ID: {u['user_id']} - {u['reason']}\n"
-            await query.edit_message_text(msg, parse_mode='HTML', reply_markup=get_admin_menu())
+            menu = get_page_menu(view, b[-1]['user_id']) if len(b) == PAGE_SIZE else ADMIN_MENU
+            await query.edit_message_text(msg, parse_mode='HTML', reply_markup=menu)
         elif data == 'admin_top_users':
-            users = admin.d.get('users', {})
-            if users:
-                sorted_users = sorted(users.items(), key=lambda x: x[1].get('analyzes', 0), reverse=True)[:5]
+            top = admin.get_top_users(5)
+            if top:
                 msg = "⭐ <b>ТОП 5 АКТИВНЫХ</b>\n\n"
-                for rank, (uid, u) in enumerate(sorted_users, 1):
+                for rank, u in enumerate(top, 1):
                     msg += f"{rank}. {u.get('name', '?')} - {u.get('analyzes', 0)} проверок\n"
             else: msg = "Нет данных"
-            await query.edit_message_text(msg, parse_mode='HTML', reply_markup=get_admin_menu())
-        elif data == 'admin_risky': await query.edit_message_text("⚠️ В разработке", reply_markup=get_admin_menu())
+            await query.edit_message_text(msg, parse_mode='HTML', reply_markup=ADMIN_MENU)
+        elif data == 'admin_risky':
+            risky = admin.get_risky_users(10)
+            if risky:
+                msg = "⚠️ <b>РИСКОВАННЫЕ ЗА СУТКИ</b>\n\n"
+                for u in risky:
+                    msg += f"ID: {u['user_id']} | {u.get('name', '?')} | угроз: {u['threats']} | ср. score: {u['avg_score']}%\n"
+            else: msg = "✅ Угроз за сутки не было"
+            await query.edit_message_text(msg, parse_mode='HTML', reply_markup=ADMIN_MENU)
+        elif data == 'admin_metrics': await query.edit_message_text(metrics_text(), parse_mode='HTML', reply_markup=ADMIN_MENU)
 
 async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id == ADMIN_ID:
-        await update.message.reply_html("👨‍💻 <b>АДМИН-ПАНЕЛЬ v5.0 ✨</b>", reply_markup=get_admin_menu())
+        await update.message.reply_html("👨‍💻 <b>АДМИН-ПАНЕЛЬ v5.0 ✨</b>", reply_markup=ADMIN_MENU)
     else:
         await update.message.reply_text("❌ Нет доступа.")
 
@@ -98,9 +171,20 @@ async def delete_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def analyze(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.effective_user.id
     if admin.is_blocked(uid): return
+    limit = flood.check(uid, len(update.message.text)) if uid != ADMIN_ID else None
+    if limit:
+        if limit == BLOCK:
+            admin.block_user(uid, "Флуд")
+            flood.forget(uid)
+            await update.message.reply_text("🚫 Вы заблокированы за флуд")
+        elif limit == TOO_LONG: await update.message.reply_text(f"✂️ Сообщение не проверено: текст длиннее {flood.max_text} символов. Пришлите фрагмент покороче")
+        elif limit == THROTTLED: await update.message.reply_text("🐢 Слишком много сообщений, подождите немного")
+        return  # SILENT: пользователь уже предупрежден
     admin.add_user(uid, update.effective_user.username, update.effective_user.first_name)
-    res = analyzer.analyze(update.message.text)
-    admin.log_analysis(uid, res['score'] >= 40)
+    try: res = await pool.analyze(update.message.text)
+    except PoolBusy: await update.message.reply_text("⏳ Слишком много проверок, повторите через минуту"); return
+    except asyncio.TimeoutError: await update.message.reply_text("⌛ Проверка заняла слишком много времени, попробуйте сократить текст"); return
+    admin.log_analysis(uid, res['score'])
     msg = f"🔍 <b>РЕЗУЛЬТАТ</b>\n📊 {res['score']}% {res['emoji']} ({res['risk_level']})\n🕵️ {res['threat_type']}\n📈 Уверенность: {res['confidence']}%\n🚩 Триггеров: {res['flags_count']}\n\n"
     if res['score'] >= 50:
         msg += "⚠️ <b>НАЙДЕНО:</b>\n" + "\n".join([f"• {x}" for x in res['detected'][:6]]) + "\n\n"
@@ -110,15 +194,81 @@ async def analyze(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else: msg += "✅ БЕЗОПАСНО"
     await update.message.reply_html(msg)
 
+async def on_startup(app: Application):
+    admin.start()
+    if RULES_POLL: analyzer.watch(RULES_POLL)
+    port, path = os.getenv("AEGIS_METRICS_PORT"), os.getenv("AEGIS_METRICS_FILE")
+    if WORKER_INDEX is not None:  # у каждого процесса-обработчика свой порт (PORT+1+номер) и свой файл
+        port = port and int(port) + 1 + WORKER_INDEX
+        if path: path = "%s.%d%s" % (os.path.splitext(path)[0], WORKER_INDEX, os.path.splitext(path)[1])
+    if port: metrics.serve(int(port))  # Prometheus: GET /metrics
+    if path: metrics.start_textfile(path)  # node_exporter textfile
+
+async def on_shutdown(app: Application):
+    analyzer.stop_watch()
+    pool.shutdown()
+    admin.close()  # финальный сброс буфера счетчиков
+    metrics.stop()
+
+# === НЕСКОЛЬКО ПРОЦЕССОВ: главный принимает апдейты и раскладывает по uid, обработчики выполняют хендлеры ===
+async def forward(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    await workers.dispatch(user.id if user else 0, update.to_dict())
+
+async def on_front_startup(app: Application):
+    workers.start()
+
+async def on_front_shutdown(app: Application):
+    # Прием уже остановлен: обработчики дорабатывают свои очереди и сбрасывают счетчики в базу
+    await workers.drain()
+    await asyncio.get_running_loop().run_in_executor(None, workers.stop)
+    admin.close()
+
+def run_worker(index, queue):
+    """Процесс-обработчик: апдейты своей доли пользователей из очереди главного процесса"""
+    global WORKER_INDEX
+    WORKER_INDEX = index
+    asyncio.run(serve_worker(queue))
+
+async def serve_worker(queue):
+    from aegis_workers import consume
+    app = get_builder().updater(None).build()  # апдейты приходят не из Telegram, а из очереди
+    add_handlers(app)
+    async with app:
+        await on_startup(app)
+        try: await consume(queue, lambda data: app.process_update(Update.de_json(data, app.bot)), int(os.getenv("AEGIS_CONCURRENT_UPDATES", "64")))
+        finally: await on_shutdown(app)
+
+def get_builder():
+    builder = Application.builder().token(TOKEN).concurrent_updates(int(os.getenv("AEGIS_CONCURRENT_UPDATES", "64")))
+    if os.getenv("AEGIS_BOT_API_URL"): builder = builder.base_url(os.getenv("AEGIS_BOT_API_URL"))  # свой Bot API или benchmarks.fake_bot_api
+    return builder
+
+def add_handlers(app: Application):
+    app.add_handler(CommandHandler("start", metrics.handler(start)))
+    app.add_handler(CommandHandler("admin", metrics.handler(admin_command)))
+    app.add_handler(CommandHandler("mydata", metrics.handler(mydata)))
+    app.add_handler(CommandHandler("delete_my_data", metrics.handler(delete_data)))
+    app.add_handler(CallbackQueryHandler(metrics.handler(button_callback)))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, metrics.handler(analyze)))
+
 def main():
+    global workers
     print("\n✅ AEGIS v5.0 PRO ЗАПУЩЕН!\n📊 1500+ триггеров | 94.3% точность\n👨‍💻 /admin для админ-панели\n")
-    app = Application.builder().token(TOKEN).build()
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("admin", admin_command))
-    app.add_handler(CommandHandler("mydata", mydata))
-    app.add_handler(CommandHandler("delete_my_data", delete_data))
-    app.add_handler(CallbackQueryHandler(button_callback))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, analyze))
-    app.run_polling()
+    if BOT_WORKERS > 1:
+        from aegis_workers import WorkerGroup  # multiprocessing нужен только с несколькими процессами
+        workers = WorkerGroup(BOT_WORKERS, run_worker, queue_size=int(os.getenv("AEGIS_WORKER_QUEUE", "1000")))
+        app = get_builder().post_init(on_front_startup).post_shutdown(on_front_shutdown).build()
+        app.add_handler(TypeHandler(Update, forward))
+    else:
+        app = get_builder().post_init(on_startup).post_shutdown(on_shutdown).build()
+        add_handlers(app)
+    if os.getenv("AEGIS_MODE", "polling") == "webhook":
+        # Telegram сам присылает апдейты на HTTP-сервер бота, они обрабатываются параллельно (AEGIS_CONCURRENT_UPDATES).
+        # По SIGINT/SIGTERM сервер перестает принимать апдейты, а app.stop() дожидается уже начатых проверок
+        app.run_webhook(listen=os.getenv("AEGIS_WEBHOOK_LISTEN", "0.0.0.0"), port=int(os.getenv("AEGIS_WEBHOOK_PORT", "8443")),
+                        url_path=os.getenv("AEGIS_WEBHOOK_PATH", "aegis"), webhook_url=os.getenv("AEGIS_WEBHOOK_URL"),
+                        secret_token=os.getenv("AEGIS_WEBHOOK_SECRET"), max_connections=int(os.getenv("AEGIS_WEBHOOK_CONNECTIONS", "100")))
+    else: app.run_polling()
 
 if __name__ == "__main__": main()